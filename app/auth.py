@@ -3,19 +3,32 @@ Módulo de autenticación.
 Gestiona la autenticación de usuarios.
 """
 
+import base64
+import hashlib
+import hmac
+import json
+import logging
 import os
+import threading
+import time
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
+import anyio
+import jwt
+from cachetools import TTLCache
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
 
-from app.database import SessionLocal
+from app.database import ScopedSession, get_redis
 from app.models import User
 
+logger = logging.getLogger(__name__)
+
 # Configuración
 SECRET_KEY = os.getenv(
     "JWT_SECRET_KEY", "your-super-secret-key-change-in-production"
@@ -27,36 +40,167 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(
 REFRESH_TOKEN_EXPIRE_DAYS = int(
     os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7")
 )
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "60"))
+USER_LOCAL_CACHE_TTL = int(os.getenv("USER_LOCAL_CACHE_TTL", "30"))
+JWT_PRIVATE_KEY_PATH = os.getenv("JWT_PRIVATE_KEY_PATH")
+JWT_PUBLIC_KEY_PATH = os.getenv("JWT_PUBLIC_KEY_PATH")
+
+
+def _cargar_claves_jwt():
+    """
+    Carga una sola vez las claves de firma y verificación.
+
+    Con HS256/HS384/HS512 ambas son SECRET_KEY. Con algoritmos
+    asimétricos (EdDSA, RS256, ES256...) se leen los PEM indicados en
+    JWT_PRIVATE_KEY_PATH y JWT_PUBLIC_KEY_PATH y se parsean a objetos
+    de clave de `cryptography`, evitando reparsearlos en cada token.
+
+    Returns:
+        tuple: (clave_firma, clave_verificacion).
+    """
+    if ALGORITHM.startswith("HS"):
+        return SECRET_KEY, SECRET_KEY
+    from cryptography.hazmat.primitives.serialization import (
+        load_pem_private_key,
+        load_pem_public_key,
+    )
+
+    if not JWT_PRIVATE_KEY_PATH or not JWT_PUBLIC_KEY_PATH:
+        raise RuntimeError(
+            f"JWT_ALGORITHM={ALGORITHM} requiere JWT_PRIVATE_KEY_PATH "
+            + "y JWT_PUBLIC_KEY_PATH"
+        )
+    with open(JWT_PRIVATE_KEY_PATH, "rb") as f:
+        private_key = load_pem_private_key(f.read(), password=None)
+    with open(JWT_PUBLIC_KEY_PATH, "rb") as f:
+        public_key = load_pem_public_key(f.read())
+    return private_key, public_key
+
+
+SIGNING_KEY, VERIFY_KEY = _cargar_claves_jwt()
+
+_HMAC_DIGESTS = {
+    "HS256": hashlib.sha256,
+    "HS384": hashlib.sha384,
+    "HS512": hashlib.sha512,
+}
+
+
+def _b64url(data: bytes) -> bytes:
+    """Codifica en base64url sin relleno (formato JWS)."""
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+# Con HMAC, el header codificado y el estado inicial del HMAC son
+# constantes: se preparan una vez y por token solo se copia el HMAC.
+if ALGORITHM in _HMAC_DIGESTS:
+    _JWT_HEADER_B64 = _b64url(
+        json.dumps(
+            {"alg": ALGORITHM, "typ": "JWT"}, separators=(",", ":")
+        ).encode()
+    )
+    _HMAC_BASE = hmac.new(
+        SECRET_KEY.encode(), digestmod=_HMAC_DIGESTS[ALGORITHM]
+    )
+else:
+    _JWT_HEADER_B64 = None
+    _HMAC_BASE = None
+
+
+def _encode_token(payload: dict) -> str:
+    """
+    Firma el payload como JWT.
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt_sha256"], deprecated="auto")
+    Args:
+        payload (dict): Claims del token (exp como entero Unix).
+
+    Returns:
+        str: Token JWT codificado.
+    """
+    if _HMAC_BASE is None:
+        return jwt.encode(payload, SIGNING_KEY, algorithm=ALGORITHM)
+    signing_input = (
+        _JWT_HEADER_B64
+        + b"."
+        + _b64url(json.dumps(payload, separators=(",", ":")).encode())
+    )
+    mac = _HMAC_BASE.copy()
+    mac.update(signing_input)
+    return (signing_input + b"." + _b64url(mac.digest())).decode()
+
+
+# Password hashing: argon2 para hashes nuevos; los bcrypt_sha256
+# existentes se siguen aceptando y se migran al iniciar sesión.
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt_sha256"],
+    deprecated="auto",
+    argon2__memory_cost=19456,
+    argon2__time_cost=2,
+    argon2__parallelism=1,
+    bcrypt_sha256__rounds=int(os.getenv("BCRYPT_ROUNDS", "12")),
+)
+# Hash de referencia para verificar aunque el email no exista, de modo
+# que el tiempo de respuesta no revele qué usuarios están registrados.
+DUMMY_HASH = pwd_context.hash("dummy-password")
 
 # JWT Bearer scheme
 security = HTTPBearer()
 
+# Caché de tokens ya verificados (token -> payload) para no repetir
+# la verificación de firma en peticiones consecutivas.
+_token_cache = TTLCache(maxsize=10_000, ttl=30)
+_token_cache_lock = threading.Lock()
+# Caché local de los datos públicos de usuarios (user_id -> dict), por
+# delante de Redis: los usuarios activos no consultan la base ni Redis
+# en cada petición. Se guardan dicts, no instancias ORM.
+_user_local_cache = TTLCache(maxsize=4096, ttl=USER_LOCAL_CACHE_TTL)
+_user_local_cache_lock = threading.Lock()
 
-def get_db():
+
+async def get_db():
     """
-    Obtiene una sesión de base de datos.
+    Obtiene la sesión asíncrona de base de datos de la petición actual.
+    La sesión se cierra y se descarta del registro al terminar.
 
     Returns:
-        Session: Sesión de base de datos.
+        AsyncSession: Sesión de base de datos.
     """
-    db = SessionLocal()
     try:
-        yield db
+        yield ScopedSession()
     finally:
-        db.close()
+        await ScopedSession.remove()
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verifica si una contraseña en texto plano coincide con su hash."""
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(
+    plain_password: str, hashed_password: str
+) -> bool:
+    """
+    Verifica si una contraseña en texto plano coincide con su hash.
+    El hash se calcula en un hilo para no bloquear el event loop.
+    """
+    return await anyio.to_thread.run_sync(
+        pwd_context.verify, plain_password, hashed_password
+    )
 
 
-def get_password_hash(password: str) -> str:
-    """Genera un hash seguro para la contraseña dada."""
-    return pwd_context.hash(password)
+async def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, Optional[str]]:
+    """
+    Verifica la contraseña y, si el hash usa un esquema o parámetros
+    obsoletos, devuelve el hash actualizado.
+
+    Returns:
+        tuple[bool, Optional[str]]: (es_valida, nuevo_hash o None).
+    """
+    return await anyio.to_thread.run_sync(
+        pwd_context.verify_and_update, plain_password, hashed_password
+    )
+
+
+async def get_password_hash(password: str) -> str:
+    """Genera un hash seguro para la contraseña dada (en un hilo)."""
+    return await anyio.to_thread.run_sync(pwd_context.hash, password)
 
 
 def create_access_token(
@@ -79,9 +223,8 @@ def create_access_token(
         expire = datetime.now(timezone.utc) + timedelta(
             minutes=ACCESS_TOKEN_EXPIRE_MINUTES
         )
-    to_encode.update({"exp": expire, "type": "access"})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    to_encode.update({"exp": int(expire.timestamp()), "type": "access"})
+    return _encode_token(to_encode)
 
 
 def create_refresh_token(data: dict) -> str:
@@ -101,9 +244,28 @@ def create_refresh_token(data: dict) -> str:
     expire = datetime.now(timezone.utc) + timedelta(
         days=REFRESH_TOKEN_EXPIRE_DAYS
     )
-    to_encode.update({"exp": expire, "type": "refresh"})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    to_encode.update(
+        {"exp": int(expire.timestamp()), "type": "refresh"}
+    )
+    return _encode_token(to_encode)
+
+
+def renovar_refresh_token(token: str, payload: dict) -> str:
+    """
+    Devuelve el mismo token de refresco mientras le quede más del 10%
+    de su vigencia; solo en el último 10% se firma uno nuevo.
+
+    Args:
+        token (str): Token de refresco recibido (ya validado).
+        payload (dict): Payload decodificado de `token`.
+
+    Returns:
+        str: Token de refresco a entregar al cliente.
+    """
+    umbral = REFRESH_TOKEN_EXPIRE_DAYS * 86400 * 0.1
+    if payload.get("exp", 0) - time.time() > umbral:
+        return token
+    return create_refresh_token(data={"sub": payload["sub"]})
 
 
 def decode_token(token: str) -> dict:
@@ -119,47 +281,142 @@ def decode_token(token: str) -> dict:
     Raises:
         HTTPException: Si el token es inválido o ha expirado.
     """
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    with _token_cache_lock:
+        payload = _token_cache.get(token)
+    if payload is not None and payload.get("exp", 0) > time.time():
         return payload
-    except JWTError as ex:
+    try:
+        payload = jwt.decode(token, VERIFY_KEY, algorithms=[ALGORITHM])
+    except jwt.PyJWTError as ex:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         ) from ex
+    # Solo se cachean tokens válidos
+    with _token_cache_lock:
+        _token_cache[token] = payload
+    return payload
 
 
-def authenticate_user(
-    db: Session, email: str, password: str
+async def authenticate_user(
+    db: AsyncSession, email: str, password: str
 ) -> Optional[User]:
     """
     Autentica a un usuario verificando su email y contraseña.
 
     Args:
-        db (Session): Sesión de base de datos.
+        db (AsyncSession): Sesión de base de datos.
         email (str): Correo del usuario.
         password (str): Contraseña en texto plano.
 
     Returns:
         Optional[User]: Objeto User si las credenciales son válidas, None en caso contrario.
     """
-    user = db.query(User).filter(User.email == email).first()
-    if not user or not verify_password(password, user.password):
+    result = await db.execute(select(User).where(User.email == email))
+    user = result.scalar_one_or_none()
+    if not user:
+        await verify_password(password, DUMMY_HASH)
+        return None
+    valid, new_hash = await verify_and_update_password(
+        password, user.password
+    )
+    if not valid:
         return None
+    if new_hash:
+        # Persistir el hash migrado (p. ej. bcrypt_sha256 -> argon2)
+        user.password = new_hash
+        await db.commit()
     return user
 
 
-def get_current_user(
+def _user_cache_key(user_id: int) -> str:
+    """Clave Redis del usuario cacheado."""
+    return f"user:{user_id}"
+
+
+def _datos_publicos(user: User) -> dict:
+    """Datos públicos del usuario, serializables a JSON."""
+    return {
+        "id": user.id,
+        "name": user.name,
+        "email": user.email,
+        "created_at": (
+            user.created_at.isoformat() if user.created_at else None
+        ),
+    }
+
+
+def _usuario_desde_datos(data: dict) -> User:
+    """Usuario (sin contraseña, fuera de sesión) desde sus datos."""
+    return User(
+        id=data["id"],
+        name=data["name"],
+        email=data["email"],
+        created_at=(
+            datetime.fromisoformat(data["created_at"])
+            if data["created_at"]
+            else None
+        ),
+    )
+
+
+async def _get_cached_user(user_id: int) -> Optional[User]:
+    """
+    Busca el usuario en la caché local y luego en Redis.
+
+    Returns:
+        Optional[User]: Usuario (sin contraseña, fuera de sesión)
+        o None si no hay caché o no está el registro.
+    """
+    with _user_local_cache_lock:
+        data = _user_local_cache.get(user_id)
+    if data is not None:
+        return _usuario_desde_datos(data)
+    redis = get_redis()
+    if redis is None:
+        return None
+    try:
+        raw = await redis.get(_user_cache_key(user_id))
+    except Exception as e:
+        logger.warning("Error leyendo usuario de Redis: %s", e)
+        return None
+    if raw is None:
+        return None
+    data = json.loads(raw)
+    with _user_local_cache_lock:
+        _user_local_cache[user_id] = data
+    return _usuario_desde_datos(data)
+
+
+async def _set_cached_user(user: User) -> None:
+    """Guarda los datos públicos del usuario (local y Redis)."""
+    data = _datos_publicos(user)
+    with _user_local_cache_lock:
+        _user_local_cache[user.id] = data
+    redis = get_redis()
+    if redis is None:
+        return
+    try:
+        await redis.set(
+            _user_cache_key(user.id),
+            json.dumps(data),
+            ex=USER_CACHE_TTL,
+        )
+    except Exception as e:
+        logger.warning("Error guardando usuario en Redis: %s", e)
+
+
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ) -> User:
     """
     Dependencia de FastAPI para obtener el usuario autenticado actual desde el token.
 
     Args:
         credentials (HTTPAuthorizationCredentials): Credenciales Bearer extraídas del header.
-        db (Session): Sesión de base de datos.
+        db (AsyncSession): Sesión de base de datos.
 
     Returns:
         User: El usuario autenticado.
@@ -190,11 +447,23 @@ def get_current_user(
             detail="Invalid user ID",
             headers={"WWW-Authenticate": "Bearer"},
         ) from ex
-    user = db.query(User).filter(User.id == user_id_int).first()
+    user = await _get_cached_user(user_id_int)
+    if user is not None:
+        return user
+    # Solo columnas públicas (el hash de contraseña no se necesita)
+    result = await db.execute(
+        select(User)
+        .options(
+            load_only(User.id, User.name, User.email, User.created_at)
+        )
+        .where(User.id == user_id_int)
+    )
+    user = result.scalar_one_or_none()
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    await _set_cached_user(user)
     return user
@@ -3,29 +3,77 @@ Módulo de configuración de la base de datos.
 Gestiona la conexión, la sesión y la base declarativa de SQLAlchemy.
 """
 
+import asyncio
 import os
+from functools import lru_cache
 
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+    async_scoped_session,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import declarative_base
 
-load_dotenv()
+try:
+    from redis import asyncio as aioredis
+except ImportError:  # Redis es opcional
+    aioredis = None
 
+load_dotenv()
 
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT")
-DB_NAME = os.getenv("DB_NAME")
 
+# Falla al importar si falta alguna variable de conexión
 DATABASE_URL = (
-    f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}"
-    + f"@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    "postgresql+asyncpg://"
+    f"{os.environ['DB_USER']}:{os.environ['DB_PASSWORD']}"
+    f"@{os.environ['DB_HOST']}:{os.environ['DB_PORT']}"
+    f"/{os.environ['DB_NAME']}"
 )
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(
-    autocommit=False, autoflush=False, bind=engine
+# Pool de conexiones: LIFO reutiliza las conexiones más recientes
+# (cachés calientes en el servidor) y deja cerrar las de desborde.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "30"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+engine = create_async_engine(
+    DATABASE_URL,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=True,
+    pool_use_lifo=True,
+)
+SessionLocal = async_sessionmaker(
+    engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+# Sesión ligada a la tarea asyncio de la petición: todas las
+# dependencias y funciones llamadas dentro de ella comparten la misma.
+ScopedSession = async_scoped_session(
+    SessionLocal, scopefunc=asyncio.current_task
 )
 Base = declarative_base()
+
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+
+@lru_cache(maxsize=1)
+def get_redis():
+    """
+    Obtiene el cliente Redis compartido (uno por proceso).
+
+    Returns:
+        Redis | None: Cliente asíncrono, o None si REDIS_URL no está
+        configurado o la librería redis no está instalada.
+    """
+    if not REDIS_URL or aioredis is None:
+        return None
+    return aioredis.from_url(REDIS_URL)
@@ -6,34 +6,60 @@ de procesamiento de videos para karaoke.
 
 import os
 import uuid
+from typing import Optional
 
 MEDIA_DIR = "media"
 
 JOB_DIR = MEDIA_DIR + "/{job_id}"
 
-VIDEOS_DIR = JOB_DIR + "/videos"
-AUDIOS_DIR = JOB_DIR + "/audios"
-IMAGENES_DIR = JOB_DIR + "/imagenes"
-SUBTITULOS_DIR = JOB_DIR + "/subtitulos"
-BITACORA_DIR = JOB_DIR + "/bitacora"
-
-VIDEO_ORIGINAL = VIDEOS_DIR + "/original.mp4"
-VIDEO_SIN_AUDIO = VIDEOS_DIR + "/sin_audio.mp4"
-VIDEO_INSTRUMENTAL = VIDEOS_DIR + "/instrumental.mp4"
-VIDEO_KARAOKE = VIDEOS_DIR + "/karaoke.mp4"
-VIDEO_KARAOKE_PREVIEW = VIDEOS_DIR + "/karaoke.mp4"
-
-AUDIO_ORIGINAL = AUDIOS_DIR + "/original.wav"
-AUDIO_VOCALS = AUDIOS_DIR + "/original/vocals.wav"
-AUDIO_INSTRUMENTAL = AUDIOS_DIR + "/original/accompaniment.wav"
-
-IMAGEN_THUMBNAIL = IMAGENES_DIR + "/thumbnail.jpg"
-
-SUBTITULOS_SRT = SUBTITULOS_DIR + "/subtitulo.srt"
-SUBTITULOS_ASS = SUBTITULOS_DIR + "/subtitulo.ass"
-
-ARCHIVO_ESTADO = BITACORA_DIR + "/estado.json"
-ARCHIVO_LOG = BITACORA_DIR + "/ffmpeg.log"
+# Tabla única de rutas de un job: atributo de Job -> ruta relativa
+# al directorio del job. Las plantillas del módulo y los atributos de
+# cada instancia se generan a partir de ella.
+_RUTAS = {
+    "job_dir": "",
+    "videos_dir": "/videos",
+    "audios_dir": "/audios",
+    "imagenes_dir": "/imagenes",
+    "subtitulos_dir": "/subtitulos",
+    "bitacora_dir": "/bitacora",
+    "video_original_file": "/videos/original.mp4",
+    "video_instrumental_file": "/videos/instrumental.mp4",
+    "video_karaoke_file": "/videos/karaoke.mp4",
+    "audio_original_file": "/audios/original.wav",
+    "audio_vocals_file": "/audios/original/vocals.wav",
+    "audio_instrumental_file": "/audios/original/accompaniment.wav",
+    "imagen_thumbnail_file": "/imagenes/thumbnail.jpg",
+    "subtitulos_srt_file": "/subtitulos/subtitulo.srt",
+    "subtitulos_ass_file": "/subtitulos/subtitulo.ass",
+    "subtitulos_overlay_file": "/subtitulos/overlay.mov",
+    "estado_actual_file": "/bitacora/estado.json",
+    "log_file": "/bitacora/ffmpeg.log",
+}
+
+VIDEOS_DIR = JOB_DIR + _RUTAS["videos_dir"]
+AUDIOS_DIR = JOB_DIR + _RUTAS["audios_dir"]
+IMAGENES_DIR = JOB_DIR + _RUTAS["imagenes_dir"]
+SUBTITULOS_DIR = JOB_DIR + _RUTAS["subtitulos_dir"]
+BITACORA_DIR = JOB_DIR + _RUTAS["bitacora_dir"]
+
+VIDEO_ORIGINAL = JOB_DIR + _RUTAS["video_original_file"]
+VIDEO_INSTRUMENTAL = JOB_DIR + _RUTAS["video_instrumental_file"]
+VIDEO_KARAOKE = JOB_DIR + _RUTAS["video_karaoke_file"]
+# La vista previa es el mismo video karaoke servido inline
+VIDEO_KARAOKE_PREVIEW = VIDEO_KARAOKE
+
+AUDIO_ORIGINAL = JOB_DIR + _RUTAS["audio_original_file"]
+AUDIO_VOCALS = JOB_DIR + _RUTAS["audio_vocals_file"]
+AUDIO_INSTRUMENTAL = JOB_DIR + _RUTAS["audio_instrumental_file"]
+
+IMAGEN_THUMBNAIL = JOB_DIR + _RUTAS["imagen_thumbnail_file"]
+
+SUBTITULOS_SRT = JOB_DIR + _RUTAS["subtitulos_srt_file"]
+SUBTITULOS_ASS = JOB_DIR + _RUTAS["subtitulos_ass_file"]
+SUBTITULOS_OVERLAY = JOB_DIR + _RUTAS["subtitulos_overlay_file"]
+
+ARCHIVO_ESTADO = JOB_DIR + _RUTAS["estado_actual_file"]
+ARCHIVO_LOG = JOB_DIR + _RUTAS["log_file"]
 
 
 class Job:
@@ -41,51 +67,42 @@ class Job:
     Clase que representa una tarea de procesamiento de video.
     """
 
-    def __init__(self, job_id: str = str(uuid.uuid4())):
+    __slots__ = (
+        "id",
+        "media_dir",
+        "video_karaoke_preview_file",
+        *_RUTAS,
+    )
+
+    def __init__(self, job_id: Optional[str] = None):
+        # Un UUID nuevo por instancia (no evaluado una vez al importar),
+        # con guiones como los job_id ya guardados
+        if job_id is None:
+            job_id = str(uuid.uuid4())
+        elif not job_id:
+            raise ValueError("job_id vacío")
         self.id = job_id
-
-        self.audio_original_file = AUDIO_ORIGINAL.format(job_id=job_id)
-        self.audio_instrumental_file = AUDIO_INSTRUMENTAL.format(
-            job_id=job_id
-        )
-        self.audio_vocals_file = AUDIO_VOCALS.format(job_id=job_id)
-
-        self.video_original_file = VIDEO_ORIGINAL.format(job_id=job_id)
-        self.video_sin_audio_file = VIDEO_SIN_AUDIO.format(
-            job_id=job_id
-        )
-        self.video_instrumental_file = VIDEO_INSTRUMENTAL.format(
-            job_id=job_id
-        )
-        self.video_karaoke_file = VIDEO_KARAOKE.format(job_id=job_id)
-        self.video_karaoke_preview_file = VIDEO_KARAOKE_PREVIEW.format(
-            job_id=job_id
-        )
-
-        self.imagen_thumbnail_file = IMAGEN_THUMBNAIL.format(
-            job_id=job_id
-        )
-
-        self.subtitulos_srt_file = SUBTITULOS_SRT.format(job_id=job_id)
-        self.subtitulos_ass_file = SUBTITULOS_ASS.format(job_id=job_id)
-
-        self.log_file = ARCHIVO_LOG.format(job_id=job_id)
-        self.estado_actual_file = ARCHIVO_ESTADO.format(job_id=job_id)
-
         self.media_dir = MEDIA_DIR
-        self.job_dir = JOB_DIR.format(job_id=job_id)
-        self.videos_dir = VIDEOS_DIR.format(job_id=job_id)
-        self.audios_dir = AUDIOS_DIR.format(job_id=job_id)
-        self.bitacora_dir = BITACORA_DIR.format(job_id=job_id)
-        self.imagenes_dir = IMAGENES_DIR.format(job_id=job_id)
+
+        job_dir = f"{MEDIA_DIR}/{job_id}"
+        for atributo, ruta in _RUTAS.items():
+            setattr(self, atributo, job_dir + ruta)
+        self.video_karaoke_preview_file = self.video_karaoke_file
 
     def crear_directorios(self):
         """
         Crea los directorios necesarios para la tarea.
         """
-        os.makedirs(self.media_dir, exist_ok=True)
+        # makedirs crea media/ y media/{job_id}; las hojas cuelgan
+        # directamente de job_dir y basta un mkdir por cada una.
         os.makedirs(self.job_dir, exist_ok=True)
-        os.makedirs(self.videos_dir, exist_ok=True)
-        os.makedirs(self.audios_dir, exist_ok=True)
-        os.makedirs(self.imagenes_dir, exist_ok=True)
-        os.makedirs(self.bitacora_dir, exist_ok=True)
+        for directorio in (
+            self.videos_dir,
+            self.audios_dir,
+            self.imagenes_dir,
+            self.bitacora_dir,
+        ):
+            try:
+                os.mkdir(directorio)
+            except FileExistsError:
+                pass
@@ -4,18 +4,42 @@ Usa archivos ya procesados del proyecto principal
 Integrado como servicio en el backend principal
 """
 
-import json
+import asyncio
+import atexit
+import logging
+import logging.handlers
 import os
+import queue
+import shlex
+import shutil
 import subprocess
 import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import asdict, dataclass
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
+import orjson
 from dotenv import load_dotenv
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
-from pydantic import BaseModel, Field
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, TypeAdapter
+
+try:
+    import av
+except ImportError:  # PyAV es opcional: sin él se usa ffprobe
+    av = None
+
+try:
+    import redis
+    import redis.asyncio
+    import rq
+except ImportError:  # Cola distribuida opcional (KARAOKE_REDIS_URL)
+    redis = None
+    rq = None
 
 from app.job import (
     MEDIA_DIR,
@@ -24,16 +48,93 @@ from app.job import (
     VIDEO_KARAOKE,
     Job,
 )
+from app.responses import ArchivoResponse
 
 # Cargar variables de entorno
 load_dotenv()
 
+# Logging del módulo: los hilos del pipeline solo encolan el registro;
+# el formateo y la escritura los hace el hilo del QueueListener.
+logger = logging.getLogger("karaoke")
+logger.setLevel(logging.INFO)
+logger.propagate = False
+_cola_logs: queue.Queue = queue.Queue(-1)
+logger.addHandler(logging.handlers.QueueHandler(_cola_logs))
+_handler_consola = logging.StreamHandler()
+_handler_consola.setFormatter(
+    logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+)
+_listener_logs = logging.handlers.QueueListener(
+    _cola_logs, _handler_consola
+)
+_listener_logs.start()
+atexit.register(_listener_logs.stop)
+
 # Configuración Karaoke optimizada - usar estructura del proyecto principal
-KARAOKE_PRESET_X264 = os.getenv("KARAOKE_PRESET_X264", "veryfast")
+# superfast: fondo mayormente estático con texto superpuesto, la
+# búsqueda de movimiento de presets más lentos casi no aporta calidad
+KARAOKE_PRESET_X264 = os.getenv("KARAOKE_PRESET_X264", "superfast")
 KARAOKE_CRF = int(os.getenv("KARAOKE_CRF", "20"))
+# Tune de x264 (vacío para no pasar -tune). fastdecode aligera la
+# reproducción del karaoke y acelera algo la codificación.
+KARAOKE_X264_TUNE = os.getenv("KARAOKE_X264_TUNE", "fastdecode")
+# Normalizar la salida a 1920x1080 (escala + bandas) en la misma
+# pasada de codificación que incrusta los subtítulos
+KARAOKE_RESIZE_1080P = (
+    os.getenv("KARAOKE_RESIZE_1080P", "false").lower() == "true"
+)
+# Rasterizar el ASS una vez a una capa transparente (overlay.mov) y
+# superponerla con overlay, en lugar de libass dentro de la composición
+KARAOKE_SUBS_OVERLAY = (
+    os.getenv("KARAOKE_SUBS_OVERLAY", "false").lower() == "true"
+)
+KARAOKE_OVERLAY_FPS = int(os.getenv("KARAOKE_OVERLAY_FPS", "30"))
+# Encoder de video: "auto" prueba NVENC/QSV/VAAPI y usa libx264 si
+# ninguno funciona; "none" fuerza libx264; o el nombre de un encoder.
+KARAOKE_HW_ENCODER = os.getenv("KARAOKE_HW_ENCODER", "auto")
+KARAOKE_VAAPI_DEVICE = os.getenv(
+    "KARAOKE_VAAPI_DEVICE", "/dev/dri/renderD128"
+)
+ENCODERS_HW = (
+    "h264_nvenc",
+    "h264_qsv",
+    "h264_vaapi",
+    "h264_videotoolbox",
+)
+# Con NVENC, decodificar también la entrada en la GPU (los frames
+# vuelven a memoria para los filtros de subtítulos)
+KARAOKE_HWACCEL_DECODE = (
+    os.getenv("KARAOKE_HWACCEL_DECODE", "true").lower() == "true"
+)
+
+# Máximo de composiciones ffmpeg simultáneas; cada una usa una parte
+# proporcional de los núcleos para no saturar la máquina
+KARAOKE_MAX_CONCURRENCY = int(os.getenv("KARAOKE_MAX_CONCURRENCY", "2"))
+FFMPEG_THREADS = max(
+    2, (os.cpu_count() or 2) // KARAOKE_MAX_CONCURRENCY
+)
+_KARAOKE_SEM = asyncio.Semaphore(KARAOKE_MAX_CONCURRENCY)
+
+# Máximo de jobs por invocación de /karaoke/ejecutar_batch
+KARAOKE_BATCH_MAX = int(os.getenv("KARAOKE_BATCH_MAX", "8"))
+
+# Cola RQ compartida: si está configurada, las composiciones las
+# ejecutan workers (`rq worker karaoke`) y el estado vive en Redis
+KARAOKE_REDIS_URL = os.getenv("KARAOKE_REDIS_URL")
+
+# Estados que indican que el job ya está encolado o en ejecución
+ESTADOS_EN_PROCESO = (
+    "queued",
+    "processing",
+    "validando_archivos",
+    "generando_video",
+    "componiendo",
+)
 
 # Timeouts para FFmpeg (en segundos)
 FFMPEG_TIMEOUT_COMPOSICION = 1800  # 30 minutos para composición final
+# Líneas finales de stderr de ffmpeg que se conservan para el log
+FFMPEG_LOG_LINEAS = int(os.getenv("FFMPEG_LOG_LINEAS", "2000"))
 FFMPEG_TIMEOUT_RESIZE = int(
     os.getenv("FFMPEG_TIMEOUT_RESIZE", "300")
 )  # 5 minutos para resize
@@ -41,22 +142,69 @@ FFMPEG_TIMEOUT_RESIZE = int(
 # Crear router para el servicio Karaoke
 karaoke_router = APIRouter(prefix="/karaoke", tags=["karaoke"])
 
+
+@dataclass(slots=True)
+class JobState:
+    """Estado de un job karaoke (en memoria y en estado.json)"""
+
+    status: str
+    progreso: int = 0
+    timestamp: Optional[str] = None
+    mensaje: Optional[str] = None
+    error: Optional[str] = None
+
+    @classmethod
+    def desde_dict(cls, datos: Dict[str, Any]) -> "JobState":
+        """Construye el estado desde el JSON persistido."""
+        return cls(
+            status=datos.get("status", "not_found"),
+            progreso=datos.get("progreso", 0),
+            timestamp=datos.get("timestamp"),
+            mensaje=datos.get("mensaje"),
+            error=datos.get("error"),
+        )
+
+
+KARAOKE_ESTADOS_MAX = int(os.getenv("KARAOKE_ESTADOS_MAX", "1024"))
+
+
+class _EstadosLRU(OrderedDict):
+    """
+    Diccionario acotado: al superar `maxlen` descarta el job actualizado
+    hace más tiempo (su estado sigue en estado.json).
+    """
+
+    def __init__(self, maxlen: int):
+        super().__init__()
+        self.maxlen = maxlen
+
+    def __setitem__(self, clave, valor):
+        super().__setitem__(clave, valor)
+        self.move_to_end(clave)
+        if len(self) > self.maxlen:
+            self.popitem(last=False)
+
+
 # Estados de jobs en memoria (en producción usar Redis/DB)
-estados_jobs = {}
+estados_jobs: Dict[str, JobState] = _EstadosLRU(KARAOKE_ESTADOS_MAX)
 
 
 # Función utilitaria para ser llamada desde main.py
-def generar_karaoke_desde_main(job: Job) -> Dict[str, Any]:
+async def generar_karaoke_desde_main(job: Job) -> Dict[str, Any]:
     """
     Función para ser llamada desde main.py después del procesamiento principal.
-    Genera el video karaoke de forma síncrona y retorna el resultado.
+    Genera el video karaoke (esperando a que termine) y retorna el
+    resultado.
     """
     try:
         # Validar que existan los archivos necesarios
-        info_archivos = validar_archivos_entrada_karaoke(job)
+        info_archivos = await asyncio.to_thread(
+            validar_archivos_entrada_karaoke, job
+        )
 
-        # Generar video karaoke
-        video_karaoke = componer_video_karaoke(job)
+        # Generar video karaoke (respetando el límite de concurrencia)
+        async with _KARAOKE_SEM:
+            video_karaoke = await componer_video_karaoke(job)
 
         return {
             "success": True,
@@ -99,12 +247,118 @@ class RespuestaEstado(BaseModel):
     error: Optional[str] = None
 
 
+# Serializador precompilado: /estado se consulta en bucle por cada job
+_ESTADO_ADAPTER = TypeAdapter(RespuestaEstado)
+
+
+class SolicitudBatch(BaseModel):
+    """Solicitud del endpoint ejecutar_batch"""
+
+    job_ids: List[str] = Field(
+        ..., min_length=1, max_length=KARAOKE_BATCH_MAX
+    )
+
+
+def _stat_or_none(path) -> Optional[os.stat_result]:
+    """os.stat de `path`, o None si no existe o no es accesible."""
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+
 def get_video_resolution(path: Path):
-    """Devuelve (width, height) del primer stream de video usando ffprobe."""
+    """
+    Devuelve (width, height) del primer stream de video.
+
+    El resultado se cachea por (ruta, mtime, tamaño), de modo que
+    consultas repetidas sobre el mismo archivo no vuelven a leerlo.
+    """
+    try:
+        st = os.stat(path)
+    except OSError as e:
+        logger.warning(
+            "No se pudo obtener resolución de %s: %s", path, e
+        )
+        return None
+    # as_posix una sola vez: PyAV y ffprobe reciben "/" también en
+    # Windows y la clave de caché no depende del separador
+    return _resolucion_cacheada(
+        Path(path).as_posix(), st.st_mtime_ns, st.st_size
+    )
+
+
+def _leer_sidecar_probe(path_str: str, mtime_ns: int, size: int):
+    """
+    Lee `<archivo>.probe.json` si corresponde a la misma versión del
+    archivo (mtime y tamaño). Sobrevive a reinicios del proceso.
+    """
     try:
-        # Convertir ruta a forward slashes para ffprobe en Windows
-        path_str = str(path).replace("\\", "/")
+        with open(path_str + ".probe.json", "rb") as f:
+            datos = orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        return {}
+    if datos.get("mtime_ns") != mtime_ns or datos.get("size") != size:
+        return {}
+    return datos
+
+
+def _escribir_sidecar_probe(
+    path_str: str, mtime_ns: int, size: int, **valores
+):
+    """Agrega `valores` al sidecar `.probe.json` (mejor esfuerzo)."""
+    datos = _leer_sidecar_probe(path_str, mtime_ns, size)
+    datos.update(valores, mtime_ns=mtime_ns, size=size)
+    try:
+        escribir_json_atomico(path_str + ".probe.json", datos)
+    except OSError as e:
+        logger.warning(
+            "No se pudo guardar probe de %s: %s", path_str, e
+        )
 
+
+@lru_cache(maxsize=256)
+def _resolucion_cacheada(path_str: str, mtime_ns: int, size: int):
+    """
+    Resolución desde el sidecar `.probe.json` o, si no está, leyendo
+    el archivo (y guardando el resultado en el sidecar).
+    """
+    datos = _leer_sidecar_probe(path_str, mtime_ns, size)
+    if "width" in datos and "height" in datos:
+        return datos["width"], datos["height"]
+    resolucion = _resolucion_probe(path_str)
+    if resolucion is not None:
+        _escribir_sidecar_probe(
+            path_str,
+            mtime_ns,
+            size,
+            width=resolucion[0],
+            height=resolucion[1],
+        )
+    return resolucion
+
+
+def _resolucion_probe(path_str: str):
+    """
+    Lee la resolución con PyAV (solo la cabecera del contenedor, sin
+    lanzar procesos) y recurre a ffprobe si PyAV no está o no la da.
+    """
+    if av is not None:
+        try:
+            with av.open(
+                path_str, metadata_errors="ignore"
+            ) as container:
+                codec = container.streams.video[0].codec_context
+                if codec.width and codec.height:
+                    return codec.width, codec.height
+        except Exception as e:
+            logger.warning("PyAV no pudo leer %s: %s", path_str, e)
+    return _resolucion_ffprobe(path_str)
+
+
+def _resolucion_ffprobe(path_str: str):
+    """Devuelve (width, height) usando ffprobe."""
+    try:
         cmd = [
             "ffprobe",
             "-v",
@@ -128,35 +382,199 @@ def get_video_resolution(path: Path):
             return None
         return int(parts[0]), int(parts[1])
     except Exception as e:
-        print(f"Warning: No se pudo obtener resolución de {path}: {e}")
+        logger.warning(
+            "No se pudo obtener resolución de %s: %s", path_str, e
+        )
+        return None
+
+
+def get_video_duration(path: Path) -> Optional[float]:
+    """
+    Devuelve la duración del video en segundos (cacheada por ruta,
+    mtime y tamaño, igual que la resolución).
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
         return None
+    return _duracion_cacheada(
+        Path(path).as_posix(), st.st_mtime_ns, st.st_size
+    )
+
+
+@lru_cache(maxsize=256)
+def _duracion_cacheada(path_str: str, mtime_ns: int, size: int):
+    """Duración desde el sidecar `.probe.json` o leyendo el archivo."""
+    datos = _leer_sidecar_probe(path_str, mtime_ns, size)
+    if "duracion" in datos:
+        return datos["duracion"]
+    duracion = _duracion_probe(path_str)
+    if duracion is not None:
+        _escribir_sidecar_probe(
+            path_str, mtime_ns, size, duracion=duracion
+        )
+    return duracion
+
+
+def _duracion_probe(path_str: str):
+    """Lee la duración con PyAV o, en su defecto, con ffprobe."""
+    if av is not None:
+        try:
+            with av.open(
+                path_str, metadata_errors="ignore"
+            ) as container:
+                if container.duration:
+                    return container.duration / av.time_base
+        except Exception as e:
+            logger.warning("PyAV no pudo leer %s: %s", path_str, e)
+    try:
+        out = subprocess.check_output(
+            [
+                "ffprobe",
+                "-v",
+                "error",
+                "-show_entries",
+                "format=duration",
+                "-of",
+                "default=noprint_wrappers=1:nokey=1",
+                path_str,
+            ],
+            text=True,
+            timeout=10,
+        )
+        return float(out.strip())
+    except Exception as e:
+        logger.warning(
+            "No se pudo obtener duración de %s: %s", path_str, e
+        )
+        return None
+
+
+def get_video_fps(path: Path) -> Optional[float]:
+    """
+    Devuelve los fotogramas por segundo del primer stream de video
+    (cacheados por ruta, mtime y tamaño, igual que la resolución).
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return _fps_cacheada(
+        Path(path).as_posix(), st.st_mtime_ns, st.st_size
+    )
+
+
+@lru_cache(maxsize=256)
+def _fps_cacheada(path_str: str, mtime_ns: int, size: int):
+    """FPS desde el sidecar `.probe.json` o leyendo el archivo."""
+    datos = _leer_sidecar_probe(path_str, mtime_ns, size)
+    if "fps" in datos:
+        return datos["fps"]
+    fps = _fps_probe(path_str)
+    if fps is not None:
+        _escribir_sidecar_probe(path_str, mtime_ns, size, fps=fps)
+    return fps
+
+
+def _fps_probe(path_str: str):
+    """Lee los FPS con PyAV o, en su defecto, con ffprobe."""
+    if av is not None:
+        try:
+            with av.open(
+                path_str, metadata_errors="ignore"
+            ) as container:
+                tasa = container.streams.video[0].average_rate
+                if tasa:
+                    return float(tasa)
+        except Exception as e:
+            logger.warning("PyAV no pudo leer %s: %s", path_str, e)
+    try:
+        out = subprocess.check_output(
+            [
+                "ffprobe",
+                "-v",
+                "error",
+                "-select_streams",
+                "v:0",
+                "-show_entries",
+                "stream=r_frame_rate",
+                "-of",
+                "default=noprint_wrappers=1:nokey=1",
+                path_str,
+            ],
+            text=True,
+            timeout=10,
+        )
+        # r_frame_rate viene como fracción, p. ej. "30000/1001"
+        numerador, _, denominador = out.strip().partition("/")
+        fps = float(numerador) / float(denominador or 1)
+        return fps or None
+    except Exception as e:
+        logger.warning("No se pudo obtener FPS de %s: %s", path_str, e)
+        return None
+
+
+def argumentos_gop(fps: Optional[float]) -> list:
+    """
+    GOP cerrado de 2 segundos (keyframe al menos cada 2 s y sin
+    keyframes extra por cambio de escena): la vista previa con Range
+    puede saltar a cualquier punto con granularidad de 2 s.
+    """
+    if not fps:
+        return []
+    return [
+        "-g",
+        str(round(fps * 2)),
+        "-keyint_min",
+        str(round(fps)),
+        "-sc_threshold",
+        "0",
+    ]
 
 
 def validar_archivos_entrada_karaoke(job: Job) -> Dict[str, Any]:
     """Valida que existan los archivos necesarios del proyecto principal para karaoke"""
 
-    if not os.path.exists(job.video_instrumental_file):
+    # Un solo stat por archivo: existencia y tamaño a la vez
+    try:
+        st_video = os.stat(job.video_instrumental_file)
+    except FileNotFoundError as e:
         raise HTTPException(
             status_code=404,
             detail={
                 "codigo": "404_VIDEO_NO_ENCONTRADO",
                 "mensaje": f"No se encontró video instrumental: {job.video_instrumental_file}",
             },
-        )
+        ) from e
 
-    if not os.path.exists(job.subtitulos_ass_file):
+    try:
+        st_ass = os.stat(job.subtitulos_ass_file)
+    except FileNotFoundError as e:
         raise HTTPException(
             status_code=404,
             detail={
                 "codigo": "404_ASS_NO_ENCONTRADO",
                 "mensaje": f"No se encontraron subtítulos ASS: {job.subtitulos_ass_file}",
             },
+        ) from e
+
+    # Fallar antes de componer si libass no puede con el ASS
+    error_ass = _verificar_ass(
+        Path(job.subtitulos_ass_file).as_posix(),
+        st_ass.st_mtime_ns,
+        st_ass.st_size,
+    )
+    if error_ass is not None:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "codigo": "400_ASS_INVALIDO",
+                "mensaje": f"Subtítulos ASS inválidos: {error_ass}",
+            },
         )
 
     # Verificar tamaño del video
-    size_in_mb = os.path.getsize(job.video_instrumental_file) / (
-        1024 * 1024
-    )
+    size_in_mb = st_video.st_size / (1024 * 1024)
 
     return {
         "video_instrumental": job.video_instrumental_file,
@@ -165,28 +583,472 @@ def validar_archivos_entrada_karaoke(job: Job) -> Dict[str, Any]:
     }
 
 
-def componer_video_karaoke(job: Job) -> Path:
-    """Compone el video karaoke usando el video instrumental + subtítulos ASS"""
+@lru_cache(maxsize=256)
+def _verificar_ass(path_str: str, mtime_ns: int, size: int):
+    """
+    Renderiza el ASS sobre unos pocos frames diminutos para detectar
+    errores de libass en menos de un segundo. El resultado se cachea
+    por (ruta, mtime, tamaño).
+
+    Returns:
+        Optional[str]: Final del stderr de ffmpeg si el ASS es
+        inválido, o None si es válido (o si no se pudo verificar).
+    """
     cmd = [
         "ffmpeg",
-        "-y",
+        "-v",
+        "error",
+        "-f",
+        "lavfi",
         "-i",
-        job.video_instrumental_file,  # Video instrumental (ya tiene audio)
+        "color=black:s=32x32:d=0.1",
         "-vf",
-        f"subtitles={job.subtitulos_ass_file}",  # Agregar subtítulos ASS
+        f"subtitles={escapar_ruta_filtro(path_str)}",
+        "-f",
+        "null",
+        "-",
+    ]
+    try:
+        resultado = subprocess.run(
+            cmd, capture_output=True, text=True, timeout=10
+        )
+    except Exception as e:
+        logger.warning(
+            "No se pudo verificar el ASS %s: %s", path_str, e
+        )
+        return None
+    if resultado.returncode != 0:
+        return resultado.stderr[-500:] or "ffmpeg falló"
+    return None
+
+
+def _argumentos_prueba_encoder(encoder: str) -> list:
+    """Argumentos extra que necesita el encoder (antes del -c:v)."""
+    if encoder == "h264_vaapi":
+        return [
+            "-vaapi_device",
+            KARAOKE_VAAPI_DEVICE,
+            "-vf",
+            "format=nv12,hwupload",
+        ]
+    return []
+
+
+@lru_cache(maxsize=1)
+def detectar_encoder() -> str:
+    """
+    Determina una sola vez el encoder H.264 a usar.
+
+    `ffmpeg -encoders` solo lista lo compilado (p. ej. los builds de
+    Windows traen NVENC aunque no haya GPU NVIDIA), por lo que cada
+    candidato se valida codificando un frame de prueba.
+    """
+    if KARAOKE_HW_ENCODER == "none":
+        return "libx264"
+    if KARAOKE_HW_ENCODER != "auto":
+        return KARAOKE_HW_ENCODER
+    try:
+        disponibles = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-encoders"],
+            capture_output=True,
+            text=True,
+            timeout=10,
+        ).stdout
+    except Exception:
+        return "libx264"
+    for encoder in ENCODERS_HW:
+        if encoder not in disponibles:
+            continue
+        cmd = [
+            "ffmpeg",
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-f",
+            "lavfi",
+            "-i",
+            "color=size=256x256:duration=0.1",
+            "-frames:v",
+            "1",
+            *_argumentos_prueba_encoder(encoder),
+            "-c:v",
+            encoder,
+            "-f",
+            "null",
+            "-",
+        ]
+        try:
+            subprocess.run(
+                cmd, capture_output=True, check=True, timeout=20
+            )
+            logger.info("Encoder de hardware detectado: %s", encoder)
+            return encoder
+        except Exception:
+            continue
+    return "libx264"
+
+
+def argumentos_decodificacion(encoder: str) -> list:
+    """
+    Opciones de entrada (antes del -i) para decodificar en hardware.
+    Si la GPU no puede decodificar el códec, ffmpeg sigue por software.
+    """
+    if encoder == "h264_nvenc" and KARAOKE_HWACCEL_DECODE:
+        return ["-hwaccel", "cuda"]
+    return []
+
+
+def argumentos_encoder(encoder: str) -> list:
+    """Argumentos de ffmpeg (calidad/velocidad) para el encoder."""
+    if encoder == "h264_nvenc":
+        return [
+            "-c:v",
+            encoder,
+            "-preset",
+            "p4",
+            "-tune",
+            "hq",
+            "-rc",
+            "vbr",
+            "-cq",
+            str(KARAOKE_CRF),
+            "-b:v",
+            "0",
+        ]
+    if encoder == "h264_qsv":
+        return [
+            "-c:v",
+            encoder,
+            "-preset",
+            "veryfast",
+            "-global_quality",
+            str(KARAOKE_CRF),
+        ]
+    if encoder == "h264_vaapi":
+        return ["-c:v", encoder, "-qp", str(KARAOKE_CRF)]
+    if encoder == "h264_videotoolbox":
+        # Calidad constante (Apple Silicon); sin fallback a software
+        return [
+            "-c:v",
+            encoder,
+            "-q:v",
+            "65",
+            "-allow_sw",
+            "0",
+            "-pix_fmt",
+            "yuv420p",
+        ]
+    args = [
         "-c:v",
         "libx264",
         "-preset",
         KARAOKE_PRESET_X264,
         "-crf",
         str(KARAOKE_CRF),
+        # 4:2:0 para reproducir en Safari/QuickTime y navegadores
+        "-pix_fmt",
+        "yuv420p",
+    ]
+    if KARAOKE_X264_TUNE:
+        args += ["-tune", KARAOKE_X264_TUNE]
+    return args
+
+
+# Caracteres especiales en opciones de filtros de ffmpeg (una sola
+# pasada de str.translate sobre la ruta)
+_FILTER_ESCAPE = str.maketrans(
+    {
+        "\\": r"\\",
+        ":": r"\:",
+        ",": r"\,",
+        "[": r"\[",
+        "]": r"\]",
+        "'": r"\'",
+        ";": r"\;",
+    }
+)
+
+
+def escapar_ruta_filtro(ruta: str) -> str:
+    """Escapa una ruta para usarla como valor de un filtro de ffmpeg."""
+    return ruta.translate(_FILTER_ESCAPE)
+
+
+def _filtros_redimension(job: Job):
+    """
+    Filtros de escalado/padding (si KARAOKE_RESIZE_1080P está activo)
+    y resolución resultante del video, o None si no se pudo leer.
+    """
+    filtros = []
+    resolucion = get_video_resolution(job.video_instrumental_file)
+    if KARAOKE_RESIZE_1080P:
+        if resolucion is None:
+            ancho, alto = 0, 0
+        else:
+            ancho, alto = resolucion
+        casi_1080p = (
+            abs(ancho - 1920) <= 4
+            and abs(alto - 1080) <= 8
+            and ancho % 2 == 0
+            and alto % 2 == 0
+        )
+        if casi_1080p:
+            # Diferencia mínima (p. ej. 1920x1088): no vale la pena
+            # escalar, se codifica con la resolución original
+            pass
+        elif ancho * 1080 == alto * 1920:
+            # Misma relación de aspecto 16:9: basta escalar, sin bandas
+            filtros.append("scale=1920:1080")
+        else:
+            filtros.append(
+                "scale=1920:1080:force_original_aspect_ratio=decrease"
+            )
+            filtros.append("pad=1920:1080:(ow-iw)/2:(oh-ih)/2")
+        if filtros:
+            resolucion = (1920, 1080)
+    return filtros, resolucion
+
+
+def construir_filtro_video(job: Job) -> str:
+    """
+    Construye el filtergraph de video para la composición karaoke.
+
+    Si KARAOKE_RESIZE_1080P está activo y el video no es 1920x1080, el
+    escalado y el padding se encadenan antes de los subtítulos, de modo
+    que ffmpeg hace una sola pasada de codificación.
+    """
+    filtros, _ = _filtros_redimension(job)
+    ruta_ass = Path(job.subtitulos_ass_file).as_posix()
+    filtros.append(f"subtitles={escapar_ruta_filtro(ruta_ass)}")
+    # El filtro subtitles es solo CPU: con VAAPI se sube el frame a GPU
+    if detectar_encoder() == "h264_vaapi":
+        filtros.append("format=nv12,hwupload")
+    return ",".join(filtros)
+
+
+def construir_filtro_overlay(job: Job) -> str:
+    """
+    Filtergraph (-filter_complex) que superpone la capa de subtítulos
+    ya rasterizada (entrada 1) sobre el video (entrada 0). La salida
+    es la etiqueta [v].
+    """
+    filtros, _ = _filtros_redimension(job)
+    base = ",".join(filtros) or "null"
+    grafo = f"[0:v]{base}[base];[base][1:v]overlay=format=auto"
+    if detectar_encoder() == "h264_vaapi":
+        grafo += ",format=nv12,hwupload"
+    return grafo + "[v]"
+
+
+async def generar_overlay_subtitulos(job: Job, duracion: float) -> bool:
+    """
+    Rasteriza el ASS una sola vez a un video transparente (QuickTime
+    RLE con alfa) del tamaño de salida. Si el overlay ya existe y es
+    más reciente que el ASS, se reutiliza.
+
+    Returns:
+        bool: True si el overlay está disponible.
+    """
+    _, resolucion = await asyncio.to_thread(_filtros_redimension, job)
+    if resolucion is None or not duracion:
+        return False
+    try:
+        if (
+            os.stat(job.subtitulos_overlay_file).st_mtime_ns
+            >= os.stat(job.subtitulos_ass_file).st_mtime_ns
+        ):
+            return True
+    except OSError:
+        pass
+    ancho, alto = resolucion
+    ruta_ass = Path(job.subtitulos_ass_file).as_posix()
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-f",
+        "lavfi",
+        "-i",
+        f"color=c=black@0.0:s={ancho}x{alto}"
+        + f":r={KARAOKE_OVERLAY_FPS}:d={duracion},format=rgba",
+        "-vf",
+        f"subtitles={escapar_ruta_filtro(ruta_ass)}",
+        "-c:v",
+        "qtrle",
+        job.subtitulos_overlay_file,
+    ]
+    with open(job.log_file, "a", encoding="utf-8") as log_file:
+        log_file.write("Overlay: " + shlex.join(cmd) + "\n")
+        log_file.flush()
+        codigo = await ejecutar_ffmpeg(
+            cmd, log_file, FFMPEG_TIMEOUT_COMPOSICION
+        )
+    if codigo != 0:
+        logger.warning(
+            "No se pudo generar el overlay del job %s; se usa libass",
+            job.id,
+        )
+        return False
+    return True
+
+
+async def _leer_progreso(stream, on_progreso):
+    """
+    Lee el flujo clave=valor de `-progress pipe:1` y pasa cada
+    out_time_us a `on_progreso`.
+    """
+    async for linea in stream:
+        clave, _, valor = linea.decode().partition("=")
+        if clave == "out_time_us":
+            try:
+                on_progreso(int(valor))
+            except ValueError:  # "N/A" al inicio
+                pass
+
+
+async def _drenar_stderr(stream, ultimas_lineas: deque):
+    """Guarda las últimas líneas de stderr en un deque acotado."""
+    async for linea in stream:
+        ultimas_lineas.append(linea)
+
+
+async def _esperar_ffmpeg(proc, on_progreso, ultimas_lineas) -> int:
+    """Espera a que termine ffmpeg consumiendo sus pipes abiertos."""
+    lectores = []
+    if on_progreso is not None:
+        lectores.append(_leer_progreso(proc.stdout, on_progreso))
+    if ultimas_lineas is not None:
+        lectores.append(_drenar_stderr(proc.stderr, ultimas_lineas))
+    await asyncio.gather(*lectores)
+    return await proc.wait()
+
+
+async def ejecutar_ffmpeg(
+    cmd: list,
+    log_file,
+    timeout: int,
+    on_progreso=None,
+    ultimas_lineas: Optional[deque] = None,
+) -> int:
+    """
+    Ejecuta ffmpeg sin bloquear el event loop, enviando su salida al
+    archivo de log. Retorna el código de salida.
+
+    Args:
+        on_progreso (callable, optional): Recibe el tiempo codificado
+            (microsegundos) a medida que ffmpeg avanza.
+        ultimas_lineas (deque, optional): Si se indica, stderr no va al
+            log sino a este deque acotado (solo se retiene la cola).
+
+    Raises:
+        subprocess.TimeoutExpired: Si excede `timeout` segundos (el
+        proceso se termina).
+        asyncio.CancelledError: Si se cancela la tarea (el proceso
+        también se termina).
+    """
+    if on_progreso is not None:
+        cmd = [cmd[0], "-progress", "pipe:1", "-nostats", *cmd[1:]]
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=(
+                asyncio.subprocess.PIPE
+                if on_progreso is not None
+                else log_file
+            ),
+            stderr=(
+                asyncio.subprocess.PIPE
+                if ultimas_lineas is not None
+                else log_file
+            ),
+        )
+    except NotImplementedError:
+        # Event loop sin soporte de subprocesos (SelectorEventLoop en
+        # Windows, p. ej. con --reload): esperar en un hilo
+        resultado = await asyncio.to_thread(
+            subprocess.run,
+            cmd,
+            stdout=log_file,
+            stderr=subprocess.STDOUT,
+            timeout=timeout,
+        )
+        return resultado.returncode
+    try:
+        return await asyncio.wait_for(
+            _esperar_ffmpeg(proc, on_progreso, ultimas_lineas), timeout
+        )
+    except asyncio.TimeoutError as ex:
+        proc.kill()
+        await proc.wait()
+        raise subprocess.TimeoutExpired(cmd, timeout) from ex
+    except asyncio.CancelledError:
+        # Tarea cancelada (apagado o cliente): no dejar ffmpeg huérfano
+        proc.kill()
+        await asyncio.shield(proc.wait())
+        raise
+
+
+async def componer_video_karaoke(job: Job) -> Path:
+    """Compone el video karaoke usando el video instrumental + subtítulos ASS"""
+    # La detección del encoder y el probe pueden lanzar procesos
+    encoder = await asyncio.to_thread(detectar_encoder)
+    duracion = await asyncio.to_thread(
+        get_video_duration, job.video_instrumental_file
+    )
+    fps = await asyncio.to_thread(
+        get_video_fps, job.video_instrumental_file
+    )
+    cmd = ["ffmpeg", "-y"]
+    if encoder == "h264_vaapi":
+        cmd += ["-vaapi_device", KARAOKE_VAAPI_DEVICE]
+    if KARAOKE_SUBS_OVERLAY and await generar_overlay_subtitulos(
+        job, duracion
+    ):
+        filtro_video = await asyncio.to_thread(
+            construir_filtro_overlay, job
+        )
+        cmd += [
+            *argumentos_decodificacion(encoder),
+            "-i",
+            job.video_instrumental_file,
+            "-i",
+            job.subtitulos_overlay_file,  # Subtítulos ya rasterizados
+            "-filter_complex",
+            filtro_video,
+            "-map",
+            "[v]",
+            "-map",
+            "0:a?",
+        ]
+    else:
+        filtro_video = await asyncio.to_thread(
+            construir_filtro_video, job
+        )
+        cmd += [
+            *argumentos_decodificacion(encoder),
+            "-i",
+            job.video_instrumental_file,  # Instrumental (con audio)
+            "-vf",
+            filtro_video,  # Subtítulos ASS (y resize opcional)
+        ]
+    cmd += [
+        *argumentos_encoder(encoder),
+        *argumentos_gop(fps),
+        "-threads",
+        str(FFMPEG_THREADS),
         "-c:a",
         "copy",  # Mantener audio sin recodificar
+        # moov al inicio: el navegador empieza a reproducir sin
+        # descargar el final del archivo
+        "-movflags",
+        "+faststart",
         job.video_karaoke_file,
     ]
+    ultimas_lineas = deque(maxlen=FFMPEG_LOG_LINEAS)
 
     try:
-        print("Incrustando subtítulos ASS con ffmpeg...")
+        logger.info(
+            "Incrustando subtítulos ASS con ffmpeg (job %s)", job.id
+        )
         with open(job.log_file, "w", encoding="utf-8") as log_file:
             log_file.write(
                 f"=== Composición final karaoke - {datetime.now()} ===\n"
@@ -198,23 +1060,51 @@ def componer_video_karaoke(job: Job) -> Path:
                 f"Subtítulos ASS: {job.subtitulos_ass_file}\n"
             )
             log_file.write(f"Output: {job.video_karaoke_file}\n")
-            log_file.write(f"Comando: {' '.join(cmd)}\n\n")
+            log_file.write("Comando: " + shlex.join(cmd) + "\n\n")
 
             # Ejecutar FFmpeg con timeout
             actualizar_estado_karaoke(
                 job,
                 "componiendo",
-                85,
+                50,
                 "Incrustando subtítulos y codificando video karaoke",
             )
-            subprocess.run(
-                cmd,
-                stdout=log_file,
-                stderr=subprocess.STDOUT,
-                text=True,
-                check=True,
-                timeout=FFMPEG_TIMEOUT_COMPOSICION,
-            )
+            ultimo_progreso = 50
+
+            def on_progreso(out_time_us: int):
+                # Mapear el avance real de ffmpeg al rango 50-99
+                nonlocal ultimo_progreso
+                if not duracion:
+                    return
+                progreso = min(
+                    99, 50 + int(out_time_us / (duracion * 1e6) * 49)
+                )
+                if progreso > ultimo_progreso:
+                    ultimo_progreso = progreso
+                    actualizar_estado_karaoke(
+                        job,
+                        "componiendo",
+                        progreso,
+                        "Incrustando subtítulos y codificando video "
+                        + "karaoke",
+                    )
+
+            log_file.flush()
+            try:
+                codigo = await ejecutar_ffmpeg(
+                    cmd,
+                    log_file,
+                    FFMPEG_TIMEOUT_COMPOSICION,
+                    on_progreso=on_progreso,
+                    ultimas_lineas=ultimas_lineas,
+                )
+            finally:
+                # Al log solo va la cola de stderr, no toda la salida
+                log_file.write(
+                    b"".join(ultimas_lineas).decode("utf-8", "replace")
+                )
+            if codigo != 0:
+                raise subprocess.CalledProcessError(codigo, cmd)
 
         if not os.path.exists(job.video_karaoke_file):
             raise subprocess.CalledProcessError(
@@ -239,7 +1129,10 @@ def componer_video_karaoke(job: Job) -> Path:
     except subprocess.CalledProcessError as e:
         # Leer el log para obtener más información del error
         error_details = f"FFmpeg falló con código {e.returncode}"
-        if os.path.exists(job.log_file):
+        if ultimas_lineas:
+            cola = b"".join(ultimas_lineas).decode("utf-8", "replace")
+            error_details += f". Log: {cola[-500:]}"
+        elif os.path.exists(job.log_file):
             try:
                 with open(job.log_file, "r", encoding="utf-8") as f:
                     log_content = f.read()
@@ -256,37 +1149,306 @@ def componer_video_karaoke(job: Job) -> Path:
         ) from e
 
 
+async def componer_karaoke_batch(jobs: List[Job]):
+    """
+    Compone varios videos karaoke con un único proceso ffmpeg: N
+    entradas, un filter_complex con una cadena de subtítulos por
+    entrada y N salidas. Se paga una sola vez el arranque de ffmpeg y
+    la inicialización de librerías.
+
+    La salida de ffmpeg queda en el log del primer job del lote.
+
+    Raises:
+        subprocess.CalledProcessError: Si ffmpeg falla.
+        subprocess.TimeoutExpired: Si excede el timeout del lote.
+    """
+    encoder = await asyncio.to_thread(detectar_encoder)
+    cmd = ["ffmpeg", "-y"]
+    if encoder == "h264_vaapi":
+        cmd += ["-vaapi_device", KARAOKE_VAAPI_DEVICE]
+    cadenas = []
+    for i, job in enumerate(jobs):
+        cmd += [
+            *argumentos_decodificacion(encoder),
+            "-i",
+            job.video_instrumental_file,
+        ]
+        filtro_video = await asyncio.to_thread(
+            construir_filtro_video, job
+        )
+        cadenas.append(f"[{i}:v]{filtro_video}[v{i}]")
+    cmd += ["-filter_complex", ";".join(cadenas)]
+    for i, job in enumerate(jobs):
+        cmd += [
+            "-map",
+            f"[v{i}]",
+            "-map",
+            f"{i}:a?",
+            *argumentos_encoder(encoder),
+            "-threads",
+            str(FFMPEG_THREADS),
+            "-c:a",
+            "copy",
+            "-movflags",
+            "+faststart",
+            job.video_karaoke_file,
+        ]
+
+    log_principal = jobs[0].log_file
+    encabezado = (
+        f"=== Composición karaoke en lote - {datetime.now()} ===\n"
+    )
+    for job in jobs[1:]:
+        with open(job.log_file, "w", encoding="utf-8") as log_file:
+            log_file.write(encabezado)
+            log_file.write(f"Log de ffmpeg: {log_principal}\n")
+
+    with open(log_principal, "w", encoding="utf-8") as log_file:
+        log_file.write(encabezado)
+        log_file.write(f"Jobs: {', '.join(job.id for job in jobs)}\n")
+        log_file.write("Comando: " + shlex.join(cmd) + "\n\n")
+        log_file.flush()
+        codigo = await ejecutar_ffmpeg(
+            cmd, log_file, FFMPEG_TIMEOUT_COMPOSICION * len(jobs)
+        )
+    if codigo != 0:
+        raise subprocess.CalledProcessError(codigo, cmd)
+
+
+def escribir_json_atomico(archivo: str, datos: dict):
+    """
+    Escribe JSON de forma atómica (temporal + os.replace), para que un
+    lector nunca vea el archivo a medio escribir.
+    """
+    tmp = archivo + ".tmp"
+    with open(tmp, "wb") as f:
+        # JSON compacto: lo leen procesos, no personas
+        f.write(orjson.dumps(datos))
+    os.replace(tmp, archivo)
+
+
+def escribir_estado_json(archivo_estado: str, info_estado: JobState):
+    """Escribe el estado del job en estado.json de forma atómica."""
+    escribir_json_atomico(archivo_estado, asdict(info_estado))
+
+
+# Escritor de estados en segundo plano: agrupa las actualizaciones que
+# llegan dentro de un intervalo y escribe solo la última de cada job.
+# Los clientes sondean a ~1 Hz; escribir más seguido no aporta.
+ESTADO_INTERVALO_ESCRITURA = 0.1
+_estados_pendientes: Dict[str, JobState] = {}
+# Estados pendientes de escribir en Redis (job_id -> (estado, evento)):
+# el cliente es síncrono y no debe bloquear el event loop
+_estados_redis_pendientes: Dict[str, tuple] = {}
+_lock_pendientes = threading.Lock()
+_lock_escritura = threading.Lock()
+_hay_pendientes = threading.Event()
+
+
+def encolar_estado_json(archivo_estado: str, info_estado: JobState):
+    """Deja el estado para el escritor (reemplaza uno no escrito)."""
+    with _lock_pendientes:
+        _estados_pendientes[archivo_estado] = info_estado
+    _hay_pendientes.set()
+
+
+def encolar_estado_redis(job_id: str, info_estado: JobState, evento):
+    """Deja el estado y su evento para escribirlos en Redis."""
+    with _lock_pendientes:
+        _estados_redis_pendientes[job_id] = (info_estado, evento)
+    _hay_pendientes.set()
+
+
+def escribir_estados_redis(pendientes: Dict[str, tuple]):
+    """
+    Escribe los estados en sus hashes de Redis y publica los eventos,
+    todo en un solo pipeline.
+    """
+    cliente = _redis_karaoke()
+    pipe = cliente.pipeline()
+    for job_id, (info_estado, evento) in pendientes.items():
+        # DEL + HSET en la transacción: los campos en None no quedan
+        # con el valor del estado anterior
+        clave = _clave_estado_redis(job_id)
+        pipe.delete(clave)
+        pipe.hset(
+            clave,
+            mapping={
+                campo: valor
+                for campo, valor in asdict(info_estado).items()
+                if valor is not None
+            },
+        )
+        pipe.publish(_canal_eventos_redis(job_id), evento)
+    pipe.execute()
+
+
+def escribir_estados_pendientes():
+    """Escribe cada estado pendiente una vez (en orden de llegada)."""
+    # Un solo escritor a la vez: un lote tomado después siempre trae
+    # estados más nuevos, nunca se pisa uno reciente con uno viejo
+    with _lock_escritura:
+        with _lock_pendientes:
+            pendientes = dict(_estados_pendientes)
+            _estados_pendientes.clear()
+            pendientes_redis = dict(_estados_redis_pendientes)
+            _estados_redis_pendientes.clear()
+        for archivo, info_estado in pendientes.items():
+            try:
+                escribir_estado_json(archivo, info_estado)
+            except OSError as e:
+                logger.warning("No se pudo escribir %s: %s", archivo, e)
+        if pendientes_redis:
+            try:
+                escribir_estados_redis(pendientes_redis)
+            except redis.RedisError as e:
+                logger.warning("No se pudo escribir en Redis: %s", e)
+
+
+def _escritor_estados():
+    """Bucle del hilo escritor (daemon)."""
+    while True:
+        _hay_pendientes.wait()
+        time.sleep(ESTADO_INTERVALO_ESCRITURA)
+        _hay_pendientes.clear()
+        escribir_estados_pendientes()
+
+
+threading.Thread(
+    target=_escritor_estados, name="karaoke-estados", daemon=True
+).start()
+# Al salir, escribir lo que quede pendiente
+atexit.register(escribir_estados_pendientes)
+
+
+@lru_cache(maxsize=1)
+def _redis_karaoke():
+    """
+    Cliente Redis síncrono de la cola karaoke (uno por proceso), o None
+    si KARAOKE_REDIS_URL no está configurado o faltan redis/rq.
+    """
+    if not KARAOKE_REDIS_URL or rq is None:
+        return None
+    return redis.Redis.from_url(KARAOKE_REDIS_URL)
+
+
+@lru_cache(maxsize=1)
+def _redis_karaoke_async():
+    """Cliente Redis asíncrono para suscripciones (pub/sub)."""
+    if _redis_karaoke() is None:
+        return None
+    return redis.asyncio.from_url(KARAOKE_REDIS_URL)
+
+
+def _clave_estado_redis(job_id: str) -> str:
+    return f"karaoke:state:{job_id}"
+
+
+def _canal_eventos_redis(job_id: str) -> str:
+    return f"karaoke:events:{job_id}"
+
+
+# Suscriptores locales de /estado-stream (job_id -> colas asyncio)
+_SUSCRIPTORES: Dict[str, set] = {}
+
+
+def guardar_estado(job: Job, info_estado: JobState):
+    """
+    Persiste el estado en estado.json, en memoria y, con cola
+    distribuida, en un hash de Redis. Además lo publica a los
+    suscriptores de /estado-stream. El archivo y Redis los escribe el
+    hilo escritor: se puede llamar desde el event loop sin bloquearlo.
+    """
+    # La memoria se actualiza ya; el archivo lo escribe el hilo escritor
+    estados_jobs[job.id] = info_estado
+    encolar_estado_json(job.estado_actual_file, info_estado)
+    evento = orjson.dumps(asdict(info_estado))
+    for cola in _SUSCRIPTORES.get(job.id, ()):
+        cola.put_nowait(evento)
+    if _redis_karaoke() is not None:
+        encolar_estado_redis(job.id, info_estado, evento)
+
+
 def actualizar_estado_karaoke(
     job: Job, estado: str, progreso: int = 0, mensaje: str = None
 ):
     """Actualiza el estado del job karaoke en el archivo JSON"""
 
-    info_estado = {
-        "status": estado,
-        "progreso": progreso,
-        "timestamp": datetime.now().isoformat(),
-        "mensaje": mensaje,
-    }
+    # Mantener error si existe (estado local: sin red en cada tick)
+    estado_previo = leer_estado_local_karaoke(job)
 
-    # Mantener error si existe
-    archivo_estado = job.estado_actual_file
-    if os.path.exists(archivo_estado):
-        try:
-            with open(archivo_estado, "r", encoding="utf-8") as f:
-                estado_previo = json.load(f)
-                if estado_previo.get("error"):
-                    info_estado["error"] = estado_previo["error"]
-        except Exception:
-            pass
+    info_estado = JobState(
+        status=estado,
+        progreso=progreso,
+        timestamp=datetime.now().isoformat(),
+        mensaje=mensaje,
+        error=estado_previo.error,
+    )
 
-    with open(archivo_estado, "w", encoding="utf-8") as f:
-        json.dump(info_estado, f, ensure_ascii=False, indent=2)
+    guardar_estado(job, info_estado)
 
-    # También actualizar en memoria
-    estados_jobs[job.id] = info_estado
 
+# Tareas de composición en curso (job_id -> Task). Mantiene una
+# referencia fuerte a cada tarea y permite cancelarlas al apagar.
+_TAREAS_KARAOKE: Dict[str, asyncio.Task] = {}
 
-def ejecutar_pipeline_karaoke(job_id: str):
+
+def lanzar_tarea_karaoke(coro, *job_ids: str) -> asyncio.Task:
+    """
+    Programa `coro` en el event loop y la registra bajo cada job_id.
+    La concurrencia real la limita _KARAOKE_SEM dentro del pipeline.
+    """
+    tarea = asyncio.create_task(coro)
+    for job_id in job_ids:
+        _TAREAS_KARAOKE[job_id] = tarea
+
+    def _quitar(t):
+        for job_id in job_ids:
+            if _TAREAS_KARAOKE.get(job_id) is t:
+                del _TAREAS_KARAOKE[job_id]
+
+    tarea.add_done_callback(_quitar)
+    return tarea
+
+
+def ejecutar_pipeline_karaoke_rq(job_id: str):
+    """Punto de entrada de los workers RQ (función síncrona)."""
+    asyncio.run(ejecutar_pipeline_karaoke(job_id))
+    # El proceso del worker termina sin pasar por atexit
+    escribir_estados_pendientes()
+
+
+def _encolar_rq(job_id: str):
+    """Encola el job en RQ (llamadas bloqueantes a Redis)."""
+    # El estado "queued" debe llegar a Redis antes que los del worker
+    escribir_estados_pendientes()
+    rq.Queue("karaoke", connection=_redis_karaoke()).enqueue(
+        ejecutar_pipeline_karaoke_rq,
+        job_id,
+        job_timeout=FFMPEG_TIMEOUT_COMPOSICION + 300,
+    )
+
+
+async def encolar_pipeline_karaoke(job_id: str):
+    """
+    Encola el job en la cola RQ si está configurada; si no, lo ejecuta
+    como tarea local del event loop.
+    """
+    if _redis_karaoke() is None:
+        lanzar_tarea_karaoke(ejecutar_pipeline_karaoke(job_id), job_id)
+        return
+    await asyncio.to_thread(_encolar_rq, job_id)
+
+
+async def cancelar_tareas_karaoke():
+    """Cancela las composiciones pendientes (apagado del servicio)."""
+    tareas = set(_TAREAS_KARAOKE.values())
+    for tarea in tareas:
+        tarea.cancel()
+    await asyncio.gather(*tareas, return_exceptions=True)
+
+
+async def ejecutar_pipeline_karaoke(job_id: str):
     """Ejecuta el pipeline de generación de video karaoke"""
     try:
         # 1. Validar archivos de entrada del proyecto principal
@@ -305,14 +1467,19 @@ def ejecutar_pipeline_karaoke(job_id: str):
             "Validando archivos del proyecto principal",
         )
 
-        validar_archivos_entrada_karaoke(job)
+        await asyncio.to_thread(validar_archivos_entrada_karaoke, job)
 
-        # 2. Componer video karaoke directamente
+        # 2. Componer video karaoke directamente. El job queda "queued"
+        # mientras espera un cupo libre de composición.
         actualizar_estado_karaoke(
-            job, "generando_video", 50, "Componiendo video karaoke"
+            job, "queued", 30, "Esperando turno de composición"
         )
+        async with _KARAOKE_SEM:
+            actualizar_estado_karaoke(
+                job, "generando_video", 50, "Componiendo video karaoke"
+            )
 
-        componer_video_karaoke(job)
+            await componer_video_karaoke(job)
 
         # 3. Finalizar
         actualizar_estado_karaoke(
@@ -326,56 +1493,132 @@ def ejecutar_pipeline_karaoke(job_id: str):
         else:
             mensaje_error = str(e.detail)
         actualizar_estado_error_karaoke(job, mensaje_error)
+    except asyncio.CancelledError:
+        actualizar_estado_error_karaoke(job, "Procesamiento cancelado")
+        raise
     except Exception as e:
         actualizar_estado_error_karaoke(job, f"Error interno: {str(e)}")
 
 
+async def ejecutar_pipeline_karaoke_batch(job_ids: List[str]):
+    """Ejecuta la generación de video karaoke de varios jobs en lote"""
+    jobs = []
+    for job_id in job_ids:
+        job = Job(job_id)
+        try:
+            await asyncio.to_thread(
+                validar_archivos_entrada_karaoke, job
+            )
+        except HTTPException as e:
+            actualizar_estado_error_karaoke(
+                job, e.detail.get("mensaje", str(e.detail))
+            )
+            continue
+        jobs.append(job)
+
+    if not jobs:
+        return
+
+    async with _KARAOKE_SEM:
+        for job in jobs:
+            actualizar_estado_karaoke(
+                job,
+                "componiendo",
+                85,
+                "Incrustando subtítulos y codificando en lote",
+            )
+        try:
+            await componer_karaoke_batch(jobs)
+        except subprocess.TimeoutExpired:
+            for job in jobs:
+                actualizar_estado_error_karaoke(
+                    job, "Timeout en composición en lote"
+                )
+            return
+        except asyncio.CancelledError:
+            for job in jobs:
+                actualizar_estado_error_karaoke(
+                    job, "Procesamiento cancelado"
+                )
+            raise
+        except Exception as e:
+            for job in jobs:
+                actualizar_estado_error_karaoke(
+                    job, f"Error en composición en lote: {str(e)}"
+                )
+            return
+
+    for job in jobs:
+        if os.path.exists(job.video_karaoke_file):
+            actualizar_estado_karaoke(
+                job, "done", 100, "Video karaoke generado exitosamente"
+            )
+        else:
+            actualizar_estado_error_karaoke(
+                job, "Video karaoke no generado"
+            )
+
+
 def actualizar_estado_error_karaoke(job: Job, mensaje_error: str):
     """Actualiza el estado a error con mensaje"""
 
     try:
-        info_estado = {
-            "status": "error",
-            "progreso": 0,
-            "timestamp": datetime.now().isoformat(),
-            "error": mensaje_error,
-            "mensaje": "Error durante el procesamiento",
-        }
-
-        with open(job.estado_actual_file, "w", encoding="utf-8") as f:
-            json.dump(info_estado, f, ensure_ascii=False, indent=2)
+        info_estado = JobState(
+            status="error",
+            progreso=0,
+            timestamp=datetime.now().isoformat(),
+            error=mensaje_error,
+            mensaje="Error durante el procesamiento",
+        )
 
-        # También actualizar en memoria
-        estados_jobs[job.id] = info_estado
+        guardar_estado(job, info_estado)
 
     except Exception as e_interno:
-        print(f"Error actualizando estado de error: {e_interno}")
+        logger.error(
+            "Error actualizando estado de error: %s", e_interno
+        )
 
 
-def leer_estado_job_karaoke(job: Job) -> Dict[str, Any]:
-    """Lee el estado actual del job desde archivo o memoria"""
+async def leer_estado_job_karaoke(job: Job) -> JobState:
+    """Lee el estado actual del job desde Redis, memoria o archivo"""
 
-    # Primero intentar leer desde archivo
-    if os.path.exists(job.estado_actual_file):
-        try:
-            with open(
-                job.estado_actual_file, "r", encoding="utf-8"
-            ) as f:
-                return json.load(f)
-        except Exception:
-            pass
+    # Con cola distribuida el estado lo escriben otros procesos: la
+    # fuente de verdad es Redis y no la memoria local
+    cliente = _redis_karaoke_async()
+    if cliente is not None:
+        datos = await cliente.hgetall(_clave_estado_redis(job.id))
+        if datos:
+            datos = {k.decode(): v.decode() for k, v in datos.items()}
+            datos["progreso"] = int(datos.get("progreso", 0))
+            return JobState.desde_dict(datos)
+    return leer_estado_local_karaoke(job)
+
+
+def leer_estado_local_karaoke(job: Job) -> JobState:
+    """Lee el estado del job desde memoria o archivo (sin Redis)"""
 
-    # Fallback: buscar en memoria
+    # Primero buscar en memoria: el proceso que ejecuta el pipeline
+    # la mantiene al día y evita abrir y parsear el JSON en cada sondeo
     if job.id in estados_jobs:
         return estados_jobs[job.id]
 
+    # Fallback: leer desde archivo (p. ej. tras reiniciar el servidor).
+    # Se abre directamente: si no existe, open falla sin un stat previo
+    try:
+        with open(job.estado_actual_file, "rb") as f:
+            estado = JobState.desde_dict(orjson.loads(f.read()))
+        estados_jobs[job.id] = estado
+        return estado
+    except Exception:
+        pass
+
     # Estado por defecto
-    return {
-        "status": "not_found",
-        "progreso": 0,
-        "timestamp": datetime.now().isoformat(),
-        "mensaje": "Job no encontrado",
-    }
+    return JobState(
+        status="not_found",
+        progreso=0,
+        timestamp=datetime.now().isoformat(),
+        mensaje="Job no encontrado",
+    )
 
 
 # Endpoints principales del servicio Karaoke
@@ -391,13 +1634,15 @@ async def ejecutar_karaoke(job_id: str):
         job = Job(job_id)
 
         # Medida de seguridad: No hacer nada si el job no existe
-        if not os.path.exists(job.job_dir):
+        if _stat_or_none(job.job_dir) is None:
             return
 
         job.crear_directorios()
 
-        # 2. Verificar si ya existe el video karaoke (idempotencia)
-        if os.path.exists(job.video_karaoke_file):
+        # 2. Verificar si ya existe el video karaoke (idempotencia); un
+        # archivo vacío es una composición fallida, no un resultado
+        st_karaoke = _stat_or_none(job.video_karaoke_file)
+        if st_karaoke is not None and st_karaoke.st_size > 0:
             return RespuestaEjecutar(
                 job_id=job_id,
                 status="done",
@@ -405,12 +1650,11 @@ async def ejecutar_karaoke(job_id: str):
             )
 
         # 3. Verificar estado actual
-        estado_actual = leer_estado_job_karaoke(job)
-        if estado_actual.get("status") in [
-            "processing",
-            "validando_archivos",
-            "generando_video",
-        ]:
+        estado_actual = await leer_estado_job_karaoke(job)
+        if (
+            job_id in _TAREAS_KARAOKE
+            or estado_actual.status in ESTADOS_EN_PROCESO
+        ):
             return RespuestaEjecutar(
                 job_id=job_id,
                 status="processing",
@@ -422,13 +1666,8 @@ async def ejecutar_karaoke(job_id: str):
             job, "queued", 0, "Job encolado para procesamiento"
         )
 
-        # Ejecutar en hilo separado para no bloquear FastAPI
-        hilo_procesamiento = threading.Thread(
-            target=ejecutar_pipeline_karaoke,
-            args=(job_id,),
-            daemon=True,
-        )
-        hilo_procesamiento.start()
+        # Ejecutar en segundo plano (tarea local o worker RQ)
+        await encolar_pipeline_karaoke(job_id)
 
         return RespuestaEjecutar(
             job_id=job_id,
@@ -448,6 +1687,72 @@ async def ejecutar_karaoke(job_id: str):
         ) from e
 
 
+@karaoke_router.post(
+    "/ejecutar_batch", response_model=List[RespuestaEjecutar]
+)
+async def ejecutar_karaoke_batch(solicitud: SolicitudBatch):
+    """
+    Endpoint karaoke en lote: genera los videos de varios jobs con un
+    solo proceso ffmpeg. Los jobs ya generados o en proceso se omiten.
+    """
+    respuestas = []
+    pendientes = []
+    # dict.fromkeys: quitar duplicados conservando el orden
+    for job_id in dict.fromkeys(solicitud.job_ids):
+        job = Job(job_id)
+        if _stat_or_none(job.job_dir) is None:
+            respuestas.append(
+                RespuestaEjecutar(
+                    job_id=job_id,
+                    status="error",
+                    mensaje="Job no encontrado",
+                )
+            )
+            continue
+        st_karaoke = _stat_or_none(job.video_karaoke_file)
+        if st_karaoke is not None and st_karaoke.st_size > 0:
+            respuestas.append(
+                RespuestaEjecutar(
+                    job_id=job_id,
+                    status="done",
+                    mensaje="Video karaoke ya generado previamente",
+                )
+            )
+            continue
+        estado_actual = await leer_estado_job_karaoke(job)
+        if (
+            job_id in _TAREAS_KARAOKE
+            or estado_actual.status in ESTADOS_EN_PROCESO
+        ):
+            respuestas.append(
+                RespuestaEjecutar(
+                    job_id=job_id,
+                    status="processing",
+                    mensaje="Job ya en procesamiento",
+                )
+            )
+            continue
+
+        job.crear_directorios()
+        actualizar_estado_karaoke(
+            job, "queued", 0, "Job encolado para procesamiento en lote"
+        )
+        pendientes.append(job_id)
+        respuestas.append(
+            RespuestaEjecutar(
+                job_id=job_id,
+                status="queued",
+                mensaje="Procesamiento en lote iniciado",
+            )
+        )
+
+    if pendientes:
+        lanzar_tarea_karaoke(
+            ejecutar_pipeline_karaoke_batch(pendientes), *pendientes
+        )
+    return respuestas
+
+
 @karaoke_router.get("/estado/{job_id}", response_model=RespuestaEstado)
 async def consultar_estado_karaoke(job_id: str):
     """
@@ -455,21 +1760,93 @@ async def consultar_estado_karaoke(job_id: str):
     """
     try:
         job = Job(job_id)
-        estado = leer_estado_job_karaoke(job)
-
-        return RespuestaEstado(
-            status=estado.get("status", "not_found"),
-            progreso=estado.get("progreso", 0),
-            mensaje=estado.get("mensaje"),
-            timestamp=estado.get("timestamp"),
-            error=estado.get("error"),
-        )
+        estado = await leer_estado_job_karaoke(job)
+        # El estado es nuestro: se construye sin volver a validar
+        respuesta = RespuestaEstado.model_construct(**asdict(estado))
 
     except Exception as e:
-        return RespuestaEstado(
+        respuesta = RespuestaEstado.model_construct(
             status="error",
+            progreso=None,
             mensaje=f"Error consultando estado: {str(e)}",
+            timestamp=None,
+            error=None,
+        )
+
+    return Response(
+        content=_ESTADO_ADAPTER.dump_json(respuesta),
+        media_type="application/json",
+    )
+
+
+# Estados tras los que el stream de eventos se cierra
+ESTADOS_FINALES = ("done", "error", "not_found")
+SSE_HEARTBEAT = 15  # segundos entre comentarios keep-alive
+
+
+async def _siguiente_evento(
+    cola: asyncio.Queue, pubsub, timeout: float
+):
+    """Siguiente estado publicado (JSON) o None tras `timeout`."""
+    if pubsub is not None:
+        mensaje = await pubsub.get_message(
+            ignore_subscribe_messages=True, timeout=timeout
         )
+        return mensaje["data"] if mensaje else None
+    try:
+        return await asyncio.wait_for(cola.get(), timeout)
+    except asyncio.TimeoutError:
+        return None
+
+
+async def _eventos_estado(job_id: str):
+    """
+    Genera eventos SSE con cada cambio de estado del job, desde el
+    estado actual hasta que llega a un estado final.
+    """
+    cola: asyncio.Queue = asyncio.Queue()
+    suscriptores = _SUSCRIPTORES.setdefault(job_id, set())
+    suscriptores.add(cola)
+    pubsub = None
+    try:
+        # Suscribirse antes de leer el estado para no perder eventos
+        cliente = _redis_karaoke_async()
+        if cliente is not None:
+            pubsub = cliente.pubsub()
+            await pubsub.subscribe(_canal_eventos_redis(job_id))
+        estado = await leer_estado_job_karaoke(Job(job_id))
+        yield b"data: " + orjson.dumps(asdict(estado)) + b"\n\n"
+        while estado.status not in ESTADOS_FINALES:
+            evento = await _siguiente_evento(
+                cola, pubsub, SSE_HEARTBEAT
+            )
+            if evento is None:
+                yield b": ping\n\n"
+                continue
+            estado = JobState.desde_dict(orjson.loads(evento))
+            yield b"data: " + evento + b"\n\n"
+    finally:
+        suscriptores.discard(cola)
+        if not suscriptores:
+            _SUSCRIPTORES.pop(job_id, None)
+        if pubsub is not None:
+            await pubsub.aclose()
+
+
+@karaoke_router.get("/estado-stream/{job_id}")
+async def stream_estado_karaoke(job_id: str):
+    """
+    Estado del job como Server-Sent Events: un evento por cambio de
+    estado, en lugar de sondear /estado periódicamente.
+    """
+    return StreamingResponse(
+        _eventos_estado(job_id),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        },
+    )
 
 
 @karaoke_router.get("/descargar/{job_id}")
@@ -480,26 +1857,17 @@ async def descargar_video_karaoke(job_id: str):
     try:
         job = Job(job_id)
 
-        if not os.path.exists(job.video_karaoke_file):
+        # Un solo stat: existencia, accesibilidad y tamaño
+        try:
+            st = os.stat(job.video_karaoke_file)
+        except FileNotFoundError as e:
             raise HTTPException(
                 status_code=404,
                 detail={
                     "codigo": "404_VIDEO_NO_ENCONTRADO",
                     "mensaje": f"Video karaoke no encontrado para job {job_id}",
                 },
-            )
-
-        # Verificar que el archivo es accesible
-        try:
-            tamaño = os.path.getsize(job.video_karaoke_file)
-            if tamaño == 0:
-                raise HTTPException(
-                    status_code=404,
-                    detail={
-                        "codigo": "404_VIDEO_VACIO",
-                        "mensaje": "El video existe pero está vacío",
-                    },
-                )
+            ) from e
         except OSError as e:
             raise HTTPException(
                 status_code=500,
@@ -509,8 +1877,20 @@ async def descargar_video_karaoke(job_id: str):
                 },
             ) from e
 
-        return FileResponse(
+        if st.st_size == 0:
+            raise HTTPException(
+                status_code=404,
+                detail={
+                    "codigo": "404_VIDEO_VACIO",
+                    "mensaje": "El video existe pero está vacío",
+                },
+            )
+
+        return ArchivoResponse(
             path=job.video_karaoke_file,
+            # Reutilizar el stat ya hecho (FileResponse no repite el
+            # os.stat antes de enviar)
+            stat_result=st,
             filename=f"karaoke_{job_id}.mp4",
             media_type="video/mp4",
             headers={
@@ -539,26 +1919,17 @@ async def preview_video_karaoke(job_id: str):
     try:
         job = Job(job_id)
 
-        if not os.path.exists(job.video_karaoke_preview_file):
+        # Un solo stat: existencia, accesibilidad y tamaño
+        try:
+            st = os.stat(job.video_karaoke_preview_file)
+        except FileNotFoundError as e:
             raise HTTPException(
                 status_code=404,
                 detail={
                     "codigo": "404_VIDEO_NO_ENCONTRADO",
                     "mensaje": f"Video karaoke no encontrado para job {job_id}",
                 },
-            )
-
-        # Verificar que el archivo es accesible y no está vacío
-        try:
-            tamaño = os.path.getsize(job.video_karaoke_preview_file)
-            if tamaño == 0:
-                raise HTTPException(
-                    status_code=404,
-                    detail={
-                        "codigo": "404_VIDEO_VACIO",
-                        "mensaje": "El video existe pero está vacío",
-                    },
-                )
+            ) from e
         except OSError as e:
             raise HTTPException(
                 status_code=500,
@@ -568,9 +1939,19 @@ async def preview_video_karaoke(job_id: str):
                 },
             ) from e
 
+        if st.st_size == 0:
+            raise HTTPException(
+                status_code=404,
+                detail={
+                    "codigo": "404_VIDEO_VACIO",
+                    "mensaje": "El video existe pero está vacío",
+                },
+            )
+
         # Retornar video para visualización en navegador (sin forzar descarga)
-        return FileResponse(
+        return ArchivoResponse(
             path=job.video_karaoke_preview_file,
+            stat_result=st,
             filename=f"karaoke_{job_id}_preview.mp4",
             media_type="video/mp4",
             headers={
@@ -603,7 +1984,9 @@ async def info_karaoke():
         "descripcion": "Sistema integrado que usa archivos del proyecto principal",
         "endpoints": {
             "ejecutar": "POST /karaoke/ejecutar/{job_id}",
+            "ejecutar_batch": "POST /karaoke/ejecutar_batch",
             "estado": "GET /karaoke/estado/{job_id}",
+            "estado_stream": "GET /karaoke/estado-stream/{job_id}",
             "preview": "GET /karaoke/preview/{job_id}",
             "descargar": "GET /karaoke/descargar/{job_id}",
             "info": "GET /karaoke/info",
@@ -617,27 +2000,50 @@ async def info_karaoke():
         "configuracion": {
             "preset_x264": KARAOKE_PRESET_X264,
             "crf": KARAOKE_CRF,
+            "tune_x264": KARAOKE_X264_TUNE or None,
+            "encoder": KARAOKE_HW_ENCODER,
+            "max_concurrencia": KARAOKE_MAX_CONCURRENCY,
+            "threads_ffmpeg": FFMPEG_THREADS,
+            "resize_1080p": KARAOKE_RESIZE_1080P,
         },
     }
 
 
-# Health check del servicio karaoke
-@karaoke_router.get("/health")
-async def health_check_karaoke():
-    """Health check del servicio karaoke"""
-    try:
-        # Verificar FFmpeg
-        ffmpeg_ok = False
+# Resultado de `ffmpeg -version`, válido HEALTH_FFMPEG_TTL segundos:
+# las sondas de liveness no lanzan un proceso en cada llamada.
+HEALTH_FFMPEG_TTL = 60
+_FFMPEG_HEALTH = {"ts": 0.0, "ok": False}
+
+
+async def _ffmpeg_disponible() -> bool:
+    """
+    Comprueba FFmpeg como mucho una vez cada HEALTH_FFMPEG_TTL. El
+    proceso se espera en un hilo para no bloquear el event loop.
+    """
+    ahora = time.monotonic()
+    if ahora - _FFMPEG_HEALTH["ts"] > HEALTH_FFMPEG_TTL:
         try:
-            subprocess.run(
+            await asyncio.to_thread(
+                subprocess.run,
                 ["ffmpeg", "-version"],
                 capture_output=True,
                 check=True,
                 timeout=5,
             )
-            ffmpeg_ok = True
+            _FFMPEG_HEALTH["ok"] = True
         except Exception:
-            pass
+            _FFMPEG_HEALTH["ok"] = False
+        _FFMPEG_HEALTH["ts"] = ahora
+    return _FFMPEG_HEALTH["ok"]
+
+
+# Health check del servicio karaoke
+@karaoke_router.get("/health")
+async def health_check_karaoke():
+    """Health check del servicio karaoke"""
+    try:
+        # Verificar FFmpeg (cacheado)
+        ffmpeg_ok = await _ffmpeg_disponible()
 
         # Verificar estructura de directorios del proyecto principal
         dirs_ok = all(
@@ -646,15 +2052,17 @@ async def health_check_karaoke():
             ]
         )
 
-        # Verificar permisos de escritura
-        write_ok = False
+        # Verificar permisos de escritura (un solo faccessat, sin
+        # crear ni borrar archivos en disco)
+        write_ok = os.access(MEDIA_DIR, os.W_OK)
+
+        # Espacio libre (statvfs, sin escribir en disco)
         try:
-            test_file = Path(MEDIA_DIR + "/test_write.tmp")
-            test_file.write_text("test", encoding="utf-8")
-            test_file.unlink()
-            write_ok = True
-        except Exception:
-            pass
+            disco_libre_gb = round(
+                shutil.disk_usage(MEDIA_DIR).free / 1e9, 2
+            )
+        except OSError:
+            disco_libre_gb = None
 
         status = (
             "healthy"
@@ -668,6 +2076,7 @@ async def health_check_karaoke():
                 "ffmpeg_disponible": ffmpeg_ok,
                 "directorio_media_ok": dirs_ok,
                 "permisos_escritura": write_ok,
+                "disco_libre_gb": disco_libre_gb,
             },
             "timestamp": datetime.now().isoformat(),
             "version": "1.0.0",
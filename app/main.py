@@ -3,15 +3,17 @@ Módulo principal de la aplicación.
 Gestiona la creación de la API y sus rutas.
 """
 
-import json
+import asyncio
 import os
+import re
 import shutil
 import subprocess
-import tempfile
 import traceback
-import zipfile
 from typing import List
 
+import aiofiles
+import anyio
+import orjson
 from fastapi import (
     BackgroundTasks,
     Depends,
@@ -23,8 +25,12 @@ from fastapi import (
     status,
 )
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
-from sqlalchemy.orm import Session
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import inspect, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from zipstream import ZIP_DEFLATED, ZIP_STORED, ZipStream
 
 from app.auth import (
     authenticate_user,
@@ -34,12 +40,28 @@ from app.auth import (
     get_current_user,
     get_db,
     get_password_hash,
+    renovar_refresh_token,
+)
+from app.database import SessionLocal, engine
+from app.job import MEDIA_DIR, Job
+from app.karaoke import (
+    RespuestaEjecutar,
+    actualizar_estado_error_karaoke,
+    actualizar_estado_karaoke,
+    cancelar_tareas_karaoke,
+    generar_karaoke_desde_main,
+    get_video_duration,
+    karaoke_router,
+    lanzar_tarea_karaoke,
 )
-from app.database import engine
-from app.job import Job
-from app.karaoke import generar_karaoke_desde_main, karaoke_router
 from app.models import Album, Base, User, Video
+from app.procesos import ejecutar_comando
+from app.responses import ArchivoResponse, respuesta_validada
 from app.schemas import (
+    ALBUM_ADAPTER,
+    ALBUMES_ADAPTER,
+    VIDEO_ADAPTER,
+    VIDEOS_ADAPTER,
     AlbumBase,
     AlbumCreate,
     AlbumResponse,
@@ -51,11 +73,13 @@ from app.schemas import (
     VideoResponse,
     VideoUpdate,
 )
+from app.spleeter_worker import separador_spleeter
 from app.subtitles import convertir_srt_a_ass
+from app.whisperx_worker import transcriptor_whisperx
 
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI()
+# orjson para todas las respuestas JSON (también las del router
+# karaoke) en lugar del json de la librería estándar
+app = FastAPI(default_response_class=ORJSONResponse)
 
 origins = ["http://localhost:5173", "http://127.0.0.1:5173"]
 app.add_middleware(
@@ -74,9 +98,156 @@ app.add_middleware(
 
 app.include_router(karaoke_router)
 
+# Desactivar cuando el esquema ya existe (varios workers, producción)
+CREATE_ALL_TABLES = os.getenv("CREATE_ALL_TABLES", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+
+# Índices de versiones anteriores del esquema -> índice que los
+# reemplaza: compuestos (album_id, created_at) y (user_id, created_at)
+# e índice único de job_id
+INDICES_OBSOLETOS = {
+    "ix_videos_album_id": "ix_videos_album_created",
+    "ix_albums_user_id": "ix_albums_user_created",
+    "ix_videos_job_id": "ux_videos_job_id",
+}
+
+
+def _crear_indices(conn):
+    """
+    Crea los índices declarados en los modelos que aún no existan y
+    elimina los reemplazados (INDICES_OBSOLETOS), que create_all nunca
+    borra.
+
+    Un índice único que no se puede crear por filas duplicadas (p. ej.
+    job_id repetidos de versiones anteriores) se registra y se omite
+    sin impedir el arranque; el índice viejo que reemplazaba se
+    conserva.
+    """
+    omitidos = set()
+    for tabla in Base.metadata.sorted_tables:
+        for indice in tabla.indexes:
+            if not indice.unique:
+                indice.create(conn, checkfirst=True)
+                continue
+            # Savepoint: el error no aborta la transacción del arranque
+            try:
+                with conn.begin_nested():
+                    indice.create(conn, checkfirst=True)
+            except IntegrityError as ex:
+                print(
+                    f"No se pudo crear el índice único {indice.name} "
+                    + f"(valores duplicados): {ex.orig}"
+                )
+                omitidos.add(indice.name)
+    for nombre, reemplazo in INDICES_OBSOLETOS.items():
+        if reemplazo not in omitidos:
+            conn.execute(text(f"DROP INDEX IF EXISTS {nombre}"))
+
+
+def _aplicar_defaults(conn):
+    """
+    Aplica los `server_default` de los modelos a columnas de tablas ya
+    existentes (create_all no altera tablas creadas antes). Solo se
+    altera una columna que todavía no tiene default: el ALTER bloquea
+    la tabla, así que no se repite en cada arranque.
+    """
+    preparador = conn.dialect.identifier_preparer
+    inspector = inspect(conn)
+    for tabla in Base.metadata.sorted_tables:
+        defaults = {
+            c["name"]: c["default"]
+            for c in inspector.get_columns(tabla.name)
+        }
+        for columna in tabla.columns:
+            if (
+                columna.server_default is None
+                or defaults.get(columna.name) is not None
+            ):
+                continue
+            defecto = columna.server_default.arg.compile(
+                dialect=conn.dialect,
+                compile_kwargs={"literal_binds": True},
+            )
+            conn.execute(
+                text(
+                    f"ALTER TABLE {preparador.format_table(tabla)} "
+                    + "ALTER COLUMN "
+                    + f"{preparador.format_column(columna)} "
+                    + f"SET DEFAULT {defecto}"
+                )
+            )
+
+
+@app.on_event("startup")
+async def crear_tablas():
+    """
+    Crea las tablas (e índices) de la base de datos si no existen.
+    Con CREATE_ALL_TABLES=false (esquema ya creado) los workers arrancan
+    sin consultar el catálogo de Postgres.
+    """
+    if not CREATE_ALL_TABLES:
+        return
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        # create_all no agrega índices ni defaults nuevos a tablas ya
+        # existentes
+        await conn.run_sync(_crear_indices)
+        await conn.run_sync(_aplicar_defaults)
+
+
+@app.on_event("startup")
+def crear_directorio_media():
+    """
+    Crea el directorio raíz de medios una sola vez al arrancar.
+    """
+    os.makedirs(MEDIA_DIR, exist_ok=True)
+
+
+@app.on_event("startup")
+async def configurar_hilos():
+    """
+    Ajusta el tamaño del pool de hilos de anyio (hashing de contraseñas
+    y rutas síncronas).
+    """
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter.total_tokens = int(os.getenv("THREAD_POOL_SIZE", "64"))
+
+
+@app.on_event("startup")
+async def iniciar_workers():
+    """
+    Lanza los procesos WhisperX y Spleeter persistentes para que el
+    primer video no pague la carga de torch/TensorFlow y los modelos.
+    """
+    await asyncio.gather(
+        transcriptor_whisperx.iniciar(), separador_spleeter.iniciar()
+    )
+
+
+@app.on_event("shutdown")
+async def detener_karaoke():
+    """
+    Cancela las composiciones karaoke en curso al apagar el servicio.
+    """
+    await cancelar_tareas_karaoke()
+
+
+@app.on_event("shutdown")
+async def detener_workers():
+    """
+    Cierra los procesos WhisperX y Spleeter persistentes.
+    """
+    await asyncio.gather(
+        transcriptor_whisperx.detener(), separador_spleeter.detener()
+    )
+
 
 @app.get("/")
-def root():
+async def root():
     """
     Ruta raíz de la API.
     Retorna un mensaje de bienvenida y las rutas de documentación.
@@ -89,34 +260,42 @@ def root():
 
 
 @app.post("/register", response_model=UserResponse)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(
+    user: UserCreate, db: AsyncSession = Depends(get_db)
+):
     """
     Ruta para registrar un nuevo usuario.
     """
-    existing_user = (
-        db.query(User).filter(User.email == user.email).first()
-    )
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered",
-        )
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
     db_user = User(
         name=user.name, email=user.email, password=hashed_password
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    # El índice único de email detecta duplicados en el mismo INSERT,
+    # sin SELECT previo (y sin carrera entre dos registros iguales)
+    try:
+        await db.commit()
+    except IntegrityError as ex:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered",
+        ) from ex
+    # id y created_at vuelven en el RETURNING del INSERT
+    # (expire_on_commit desactivado): no hace falta refresh
     return db_user
 
 
 @app.post("/login", response_model=Token)
-def login(login_data: LoginRequest, db: Session = Depends(get_db)):
+async def login(
+    login_data: LoginRequest, db: AsyncSession = Depends(get_db)
+):
     """
     Ruta para iniciar sesión.
     """
-    user = authenticate_user(db, login_data.email, login_data.password)
+    user = await authenticate_user(
+        db, login_data.email, login_data.password
+    )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -133,7 +312,7 @@ def login(login_data: LoginRequest, db: Session = Depends(get_db)):
 
 
 @app.post("/refresh", response_model=Token)
-def refresh_token(token_data: TokenRefresh):
+async def refresh_token(token_data: TokenRefresh):
     """
     Ruta para refrescar el token de acceso.
     """
@@ -150,7 +329,9 @@ def refresh_token(token_data: TokenRefresh):
             detail="Invalid token",
         )
     the_access_token = create_access_token(data={"sub": user_id})
-    the_refresh_token = create_refresh_token(data={"sub": user_id})
+    the_refresh_token = renovar_refresh_token(
+        token_data.refresh_token, payload
+    )
     return {
         "access_token": the_access_token,
         "refresh_token": the_refresh_token,
@@ -159,53 +340,294 @@ def refresh_token(token_data: TokenRefresh):
 
 
 @app.get("/me", response_model=UserResponse)
-def get_me(current_user: User = Depends(get_current_user)):
+async def get_me(current_user: User = Depends(get_current_user)):
     """
     Ruta para obtener la información del usuario actual.
     """
     return current_user
 
 
-@app.post("/procesar-video/")
-async def procesar_video(
-    album_id: int = Form(...),
-    file: UploadFile = File(...),
-    language: str = Form("auto"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Caracteres no permitidos en el nombre de salida (se conservan
+# letras y dígitos Unicode, espacio, guion y guion bajo)
+_NOMBRE_NO_PERMITIDO = re.compile(r"[^\w \-]+")
+
+
+async def generar_thumbnail(job: Job):
+    """
+    Extrae un frame del segundo 5 como miniatura (mejor esfuerzo).
+    """
+    try:
+        await ejecutar_comando(
+            [
+                "ffmpeg",
+                "-ss",
+                "00:00:05",
+                "-i",
+                job.video_original_file,
+                "-vframes",
+                "1",
+                job.imagen_thumbnail_file,
+                "-y",
+            ]
+        )
+    except Exception as e:
+        print(f"Error generando thumbnail: {e}")
+
+
+async def validar_album_propio(
+    album_id: int, db: AsyncSession, current_user: User
 ):
     """
-    Ruta para procesar un video.
+    Verifica que el álbum exista y pertenezca al usuario.
+
+    Raises:
+        HTTPException: 404 si no existe, 403 si es de otro usuario.
     """
-    # Validar que el album existe y pertenece al usuario
-    album = db.query(Album).filter(Album.id == album_id).first()
-    if not album:
+    # Solo el dueño: sin cargar el álbum ni sus videos
+    propietario = await db.scalar(
+        select(Album.user_id).where(Album.id == album_id)
+    )
+    if propietario is None:
         raise HTTPException(
             status_code=404, detail="Álbum no encontrado"
         )
-    if album.user_id != current_user.id:
+    if propietario != current_user.id:
         raise HTTPException(
             status_code=403, detail="No autorizado para este álbum"
         )
+    # Cerrar la transacción de lectura: no retener una conexión del
+    # pool durante los minutos de procesamiento
+    await db.rollback()
+
 
-    # Capturar nombre original del archivo para el nombre de salida
+async def obtener_video_propio(
+    job_id: str, db: AsyncSession, current_user: User
+) -> Video:
+    """
+    Obtiene el video y el dueño de su álbum en una sola consulta (la
+    tabla Video no tiene user_id directo, se accede via álbum).
+
+    Raises:
+        HTTPException: 404 si no existe, 403 si es de otro usuario.
+    """
+    result = await db.execute(
+        select(Video, Album.user_id)
+        .join(Album, Video.album_id == Album.id)
+        .where(Video.job_id == job_id)
+    )
+    fila = result.first()
+    if fila is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Video no encontrado",
+        )
+    video, propietario = fila
+    if propietario != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No autorizado",
+        )
+    return video
+
+
+def archivos_presentes(*rutas: str) -> set:
+    """
+    Devuelve cuáles de `rutas` existen como archivo, con un solo
+    scandir por directorio en lugar de un stat por archivo.
+    """
+    por_directorio = {}
+    for ruta in rutas:
+        directorio, nombre = os.path.split(ruta)
+        por_directorio.setdefault(directorio, {})[nombre] = ruta
+    presentes = set()
+    for directorio, buscadas in por_directorio.items():
+        try:
+            with os.scandir(directorio) as entradas:
+                presentes.update(
+                    buscadas[e.name]
+                    for e in entradas
+                    if e.name in buscadas and e.is_file()
+                )
+        except FileNotFoundError:
+            pass
+    return presentes
+
+
+def nombre_base_upload(file: UploadFile) -> str:
+    """
+    Nombre original del archivo (sin extensión) para el nombre de
+    salida, sanitizado para evitar problemas con caracteres especiales.
+    """
     original_filename = file.filename or "video"
     base_name = os.path.splitext(original_filename)[0]
-    # Sanitizar nombre para evitar problemas con caracteres especiales
-    base_name = "".join(
-        c for c in base_name if c.isalnum() or c in (" ", "-", "_")
-    ).strip()
+    return _NOMBRE_NO_PERMITIDO.sub("", base_name).strip()
 
-    # Generar UUID único para toda la sesión
-    job = Job()
-    job.crear_directorios()
+
+async def guardar_upload(file: UploadFile, job: Job):
+    """
+    Copia el upload en bloques de 1 MiB sin bloquear el event loop ni
+    cargar el video completo en memoria.
+    """
+    async with aiofiles.open(job.video_original_file, "wb") as f:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            await f.write(chunk)
+
+
+def _sin_etapas(estado: str, progreso: int, mensaje: str):
+    """Callback de etapas por defecto (modo síncrono)."""
+
+
+async def generar_subtitulos_y_karaoke(
+    job: Job, language: str, etapa, mux_instrumental: asyncio.Task
+):
+    """
+    WhisperX (SRT), conversión SRT->ASS y video karaoke. Los errores se
+    registran sin interrumpir el procesamiento; el karaoke espera al
+    mux instrumental.
+    """
+    # --- Generación de subtítulos (SRT y ASS) desde vocals.wav ---
 
     try:
-        with open(job.video_original_file, "wb") as f:
-            f.write(await file.read())
+        # WhisperX corre en un proceso persistente de venv_torch
+        # (modelo ya cargado) con autodetección de idioma y device
+        audio_in = (
+            job.audio_vocals_file
+            if os.path.exists(job.audio_vocals_file)
+            else job.audio_original_file
+        )
+
+        try:
+            print(f"Audio: {audio_in}")
+            print(f"SRT output: {job.subtitulos_srt_file}")
+            print(f"Idioma: {language}")
+
+            etapa("processing", 40, "Transcribiendo letra (WhisperX)")
+            await transcriptor_whisperx.transcribir(
+                audio_in, job.subtitulos_srt_file, language
+            )
+
+            print(
+                "Etapa: Transcripción completada "
+                + "(WhisperX) y SRT generado."
+            )
 
-        # Obtener audio (original)
-        subprocess.run(
+            # Verificar que el SRT fue creado
+            if not os.path.exists(job.subtitulos_srt_file):
+                raise FileNotFoundError(
+                    "WhisperX no generó el archivo SRT: "
+                    + job.subtitulos_srt_file
+                )
+
+        except subprocess.CalledProcessError as e:
+            print("ERROR: WhisperX falló")
+            print(f"Código de error: {e.returncode}")
+            if e.stderr:
+                print(f"STDERR: {e.stderr}")
+            raise
+        except FileNotFoundError as e:
+            print(f"ERROR: {e}")
+            raise
+
+        # Intentar convertir SRT -> ASS (karaoke) si el SRT existe
+        if os.path.exists(job.subtitulos_srt_file):
+            try:
+                print("Etapa: Convirtiendo SRT a ASS (karaoke)...")
+                # Lectura/escritura y parseo en un hilo del pool
+                await asyncio.to_thread(
+                    convertir_srt_a_ass,
+                    job.subtitulos_srt_file,
+                    job.subtitulos_ass_file,
+                )
+                print(
+                    "Conversión SRT->ASS completada: "
+                    + f"{job.subtitulos_ass_file}"
+                )
+            except Exception as e:
+                print(f"ERROR en conversión SRT->ASS: {e}")
+                raise
+
+        # Verificar si el ASS fue creado exitosamente
+        # (lo importante para karaoke)
+        if os.path.exists(job.subtitulos_ass_file):
+            # --- Generación automática de video karaoke ---
+            try:
+                print(
+                    "Etapa: Generando video karaoke "
+                    + "(incrustando subtitles)..."
+                )
+                # El karaoke parte del video instrumental
+                await mux_instrumental
+                etapa(
+                    "generando_video", 70, "Componiendo video karaoke"
+                )
+                resultado_karaoke = await generar_karaoke_desde_main(
+                    job
+                )
+                if resultado_karaoke["success"]:
+                    # Agregar el video karaoke a la base de datos
+                    print(
+                        "Video karaoke generado: "
+                        + f"{job.video_karaoke_file}"
+                    )
+                else:
+                    error_de_resaltado = resultado_karaoke.get(
+                        "error", "Error desconocido"
+                    )
+                    print(
+                        "Error generando karaoke: "
+                        + f"{error_de_resaltado}"
+                    )
+            except Exception as e:
+                # No interrumpir el flujo principal si falla el karaoke
+                print(f"Warning: No se pudo generar video karaoke: {e}")
+                traceback.print_exc()
+            # --- Fin generación karaoke ---
+        else:
+            print(
+                "WARNING: Archivo ASS no fue generado: "
+                + f"{job.subtitulos_ass_file}"
+            )
+
+    except Exception as e:
+        # Log detallado del error
+        # pero no interrumpir la respuesta principal
+        print(f"ERROR en generación de subtítulos/karaoke: {e}")
+        traceback.print_exc()
+    # --- Fin subtítulos ---
+
+
+async def procesar_job_video(
+    job: Job,
+    base_name: str,
+    album_id: int,
+    language: str,
+    db: AsyncSession,
+    etapa=_sin_etapas,
+) -> bool:
+    """
+    Pipeline completo sobre el video ya guardado en el job: audio,
+    Spleeter, mux instrumental, WhisperX, SRT->ASS y karaoke. Registra
+    el video en la BD apenas se conoce su duración.
+
+    Args:
+        etapa: Callback (estado, progreso, mensaje) por cada etapa.
+
+    Returns:
+        bool: True si se generó el video karaoke.
+
+    Raises:
+        subprocess.CalledProcessError: Si falla ffmpeg o Spleeter.
+        FileNotFoundError: Si Spleeter no generó el instrumental.
+    """
+    etapa("processing", 5, "Extrayendo audio")
+
+    # Audio, duración y thumbnail leen el original recién escrito
+    # (todavía en la caché de páginas): se lanzan a la vez en vez
+    # de releerlo tres veces seguidas. No hace falta una copia del
+    # video sin audio: el mux instrumental toma el video original
+    _, duracion, _ = await asyncio.gather(
+        ejecutar_comando(
             [
                 "ffmpeg",
                 "-i",
@@ -216,114 +638,50 @@ async def procesar_video(
                 "a",
                 job.audio_original_file,
                 "-y",
-            ],
-            check=True,
-        )
-
-        # Obtener video (sin audio)
-        subprocess.run(
-            [
-                "ffmpeg",
-                "-i",
-                job.video_original_file,
-                "-c",
-                "copy",
-                "-an",
-                job.video_sin_audio_file,
-                "-y",
-            ],
-            check=True,
-        )
-
-        # Obtener duración del video usando ffprobe
-        duration_in_seconds = 0
-        try:
-            probe = subprocess.run(
-                [
-                    "ffprobe",
-                    "-v",
-                    "error",
-                    "-show_entries",
-                    "format=duration",
-                    "-of",
-                    "default=noprint_wrappers=1:nokey=1",
-                    job.video_original_file,
-                ],
-                capture_output=True,
-                text=True,
-                check=True,
-            )
-            duration_in_seconds = int(float(probe.stdout.strip()))
-        except Exception as e:
-            print(f"Error obteniendo duración: {e}")
+            ]
+        ),
+        # Probe cacheado por (ruta, mtime, tamaño) que comparte el
+        # módulo karaoke (PyAV y, si falta, ffprobe)
+        asyncio.to_thread(get_video_duration, job.video_original_file),
+        generar_thumbnail(job),
+    )
+    if duracion is None:
+        print("Error obteniendo duración del video")
+    duration_in_seconds = int(duracion or 0)
 
-        # Crear entidad Video
-        video_entity = Video(
+    # Crear entidad Video (sin refresh: el id no se usa después)
+    db.add(
+        Video(
             name=base_name,
             job_id=job.id,
             duration_in_seconds=duration_in_seconds,
             format="mp4",
             album_id=album_id,
         )
-        db.add(video_entity)
-        db.commit()
-        db.refresh(video_entity)
+    )
+    await db.commit()
 
-        # Generar Thumbnail
-        try:
-            subprocess.run(
-                [
-                    "ffmpeg",
-                    "-ss",
-                    "00:00:05",
-                    "-i",
-                    job.video_original_file,
-                    "-vframes",
-                    "1",
-                    job.imagen_thumbnail_file,
-                    "-y",
-                ],
-                check=True,
-            )
+    # Spleeter persistente (modelo ya cargado) con cupo limitado de
+    # separaciones simultáneas; el resto de uploads espera turno
+    etapa("processing", 15, "Separando voces e instrumental")
+    await separador_spleeter.separar(
+        job.audio_original_file, job.audios_dir
+    )
+    print("Etapa: Separación de stems completada (Spleeter).")
 
-        except Exception as e:
-            print(f"Error generando thumbnail: {e}")
-
-        # Usar ruta completa del ejecutable spleeter en el entorno virtual
-        project_root = os.path.dirname(
-            os.path.dirname(__file__)
-        )  # Raíz del proyecto
-        spleeter_executable = os.path.join(
-            project_root, "venv", "Scripts", "spleeter.exe"
+    if not os.path.exists(job.audio_instrumental_file):
+        raise FileNotFoundError(
+            "Archivo de audio instrumental no encontrado"
         )
 
-        subprocess.run(
-            [
-                spleeter_executable,
-                "separate",
-                "-p",
-                "spleeter:2stems",
-                "-o",
-                job.audios_dir,
-                job.audio_original_file,
-            ],
-            check=True,
-        )
-        print("Etapa: Separación de stems completada (Spleeter).")
-
-        if not os.path.exists(job.audio_instrumental_file):
-            return JSONResponse(
-                {
-                    "error": "Archivo de audio instrumental no encontrado"
-                },
-                status_code=500,
-            )
-
-        subprocess.run(
+    # Spleeter deja los stems en su ruta final (sin copias): el mux
+    # lee accompaniment.wav mientras WhisperX lee vocals.wav
+    mux_instrumental = asyncio.create_task(
+        ejecutar_comando(
             [
                 "ffmpeg",
                 "-i",
-                job.video_sin_audio_file,
+                job.video_original_file,
                 "-i",
                 job.audio_instrumental_file,
                 "-c:v",
@@ -334,195 +692,88 @@ async def procesar_video(
                 "1:a:0",
                 job.video_instrumental_file,
                 "-y",
-            ],
-            check=True,
+            ]
         )
+    )
 
-        # --- Generación de subtítulos (SRT y ASS) desde vocals.wav ---
-
-        try:
-            # Ejecutar WhisperX en entorno separado (venv_torch)
-            # con autodetección de idioma y device
-            # Calcular ruta relativa al venv_torch desde la ubicación actual
-            project_root = os.path.dirname(
-                os.path.dirname(__file__)
-            )  # Subir desde app/ a raíz
-            venv_torch_python = os.getenv(
-                "WHISPERX_PY",
-                os.path.join(
-                    project_root, "venv_torch", "Scripts", "python.exe"
-                ),
-            )
-            audio_in = (
-                job.audio_vocals_file
-                if os.path.exists(job.audio_vocals_file)
-                else job.audio_original_file
-            )
-
-            # Asegurar rutas absolutas y cwd=raíz del proyecto
-            # para resolver import de `app.*`
-            project_root = os.path.abspath(
-                os.path.join(os.path.dirname(__file__), "..")
-            )
-            script_path = os.path.join(
-                project_root, "app", "whisperx_run.py"
+    try:
+        await generar_subtitulos_y_karaoke(
+            job, language, etapa, mux_instrumental
+        )
+        # Propaga el error del mux (si lo hubo) como fallo del proceso
+        await mux_instrumental
+    finally:
+        # Cancelación (apagado) o error: no dejar el mux corriendo sin
+        # que nadie lo espere
+        if not mux_instrumental.done():
+            mux_instrumental.cancel()
+            await asyncio.gather(
+                mux_instrumental, return_exceptions=True
             )
+    return os.path.exists(job.video_karaoke_file)
 
-            try:
-                print(f"Iniciando WhisperX: {venv_torch_python}")
-                print(f"Script: {script_path}")
-                print(f"Audio: {audio_in}")
-                print(f"SRT output: {job.subtitulos_srt_file}")
-                print(f"Idioma: {language}")
-
-                resultado_whisperx = subprocess.run(
-                    [
-                        venv_torch_python,
-                        script_path,
-                        "--audio",
-                        audio_in,
-                        "--srt",
-                        job.subtitulos_srt_file,
-                        "--language",
-                        language,
-                    ],
-                    check=False,  # No lanzar excepción, capturar el código
-                    cwd=project_root,
-                    capture_output=True,
-                    text=True,
-                )
 
-                if resultado_whisperx.returncode != 0:
-                    print(
-                        "ERROR WhisperX - Código: "
-                        + f"{resultado_whisperx.returncode}"
-                    )
-                    print(f"STDOUT:\n{resultado_whisperx.stdout}")
-                    print(f"STDERR:\n{resultado_whisperx.stderr}")
-                    raise subprocess.CalledProcessError(
-                        resultado_whisperx.returncode,
-                        "whisperx_run.py",
-                        output=resultado_whisperx.stdout,
-                        stderr=resultado_whisperx.stderr,
-                    )
-
-                print(
-                    "Etapa: Transcripción completada "
-                    + "(WhisperX) y SRT generado."
-                )
-
-                # Verificar que el SRT fue creado
-                if not os.path.exists(job.subtitulos_srt_file):
-                    raise FileNotFoundError(
-                        "WhisperX no generó el archivo SRT: "
-                        + job.subtitulos_srt_file
-                    )
-
-            except subprocess.CalledProcessError as e:
-                print("ERROR: WhisperX falló")
-                print(f"Código de error: {e.returncode}")
-                if e.stderr:
-                    print(f"STDERR: {e.stderr}")
-                raise
-            except FileNotFoundError as e:
-                print(f"ERROR: {e}")
-                raise
+@app.post("/procesar-video/")
+async def procesar_video(
+    album_id: int = Form(...),
+    file: UploadFile = File(...),
+    language: str = Form("auto"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Ruta para procesar un video.
+    """
+    await validar_album_propio(album_id, db, current_user)
+    base_name = nombre_base_upload(file)
 
-            # Intentar convertir SRT -> ASS (karaoke) si el SRT existe
-            if os.path.exists(job.subtitulos_srt_file):
-                try:
-                    print("Etapa: Convirtiendo SRT a ASS (karaoke)...")
-                    convertir_srt_a_ass(
-                        job.subtitulos_srt_file, job.subtitulos_ass_file
-                    )
-                    print(
-                        "Conversión SRT->ASS completada: "
-                        + f"{job.subtitulos_ass_file}"
-                    )
-                except Exception as e:
-                    print(f"ERROR en conversión SRT->ASS: {e}")
-                    raise
-
-            # Verificar si el ASS fue creado exitosamente
-            # (lo importante para karaoke)
-            if os.path.exists(job.subtitulos_ass_file):
-                # --- Generación automática de video karaoke ---
-                try:
-                    print(
-                        "Etapa: Generando video karaoke "
-                        + "(incrustando subtitles)..."
-                    )
-                    resultado_karaoke = generar_karaoke_desde_main(job)
-                    if resultado_karaoke["success"]:
-                        # Agregar el video karaoke a la base de datos
-                        print(
-                            "Video karaoke generado: "
-                            + f"{job.video_karaoke_file}"
-                        )
-                    else:
-                        error_de_resaltado = resultado_karaoke.get(
-                            "error", "Error desconocido"
-                        )
-                        print(
-                            "Error generando karaoke: "
-                            + f"{error_de_resaltado}"
-                        )
-                except Exception as e:
-                    # No interrumpir el flujo principal si falla el karaoke
-                    print(
-                        f"Warning: No se pudo generar video karaoke: {e}"
-                    )
-                    traceback.print_exc()
-                # --- Fin generación karaoke ---
-            else:
-                print(
-                    "WARNING: Archivo ASS no fue generado: "
-                    + f"{job.subtitulos_ass_file}"
-                )
+    # Generar UUID único para toda la sesión
+    job = Job()
+    # Los mkdir del job van en un solo salto al pool de hilos
+    await asyncio.to_thread(job.crear_directorios)
 
-        except Exception as e:
-            # Log detallado del error
-            # pero no interrumpir la respuesta principal
-            print(f"ERROR en generación de subtítulos/karaoke: {e}")
-            traceback.print_exc()
-        # --- Fin subtítulos ---
+    try:
+        await guardar_upload(file, job)
+        karaoke_generado = await procesar_job_video(
+            job, base_name, album_id, language, db
+        )
 
         # Si se generó el karaoke exitosamente,
         # descargar karaoke; sino, instrumental
-        if os.path.exists(job.video_karaoke_file):
+        if karaoke_generado:
+            # SRT y ASS comparten directorio: un solo scandir
+            subtitulos = archivos_presentes(
+                job.subtitulos_srt_file, job.subtitulos_ass_file
+            )
             # Descargar video karaoke (final deseado) con nombre original
-            return FileResponse(
+            return ArchivoResponse(
                 path=job.video_karaoke_file,
                 media_type="video/mp4",
                 filename=f"{base_name}_karaoke.mp4",
                 headers={
                     "X-Job-ID": job.id,
                     "X-Video-Type": "karaoke",
-                    "X-Archivos-Generados": json.dumps(
+                    "X-Archivos-Generados": orjson.dumps(
                         {
                             "video_instrumental": job.video_instrumental_file,
                             "subtitulos_srt": (
                                 job.subtitulos_srt_file
-                                if os.path.exists(
-                                    job.subtitulos_srt_file
-                                )
+                                if job.subtitulos_srt_file in subtitulos
                                 else None
                             ),
                             "subtitulos_ass": (
                                 job.subtitulos_ass_file
-                                if os.path.exists(
-                                    job.subtitulos_ass_file
-                                )
+                                if job.subtitulos_ass_file in subtitulos
                                 else None
                             ),
                             "video_karaoke": job.video_karaoke_file,
                         }
-                    ),
+                    ).decode(),
                 },
             )
         else:
             # Fallback: descargar video instrumental si no hay karaoke
-            return FileResponse(
+            return ArchivoResponse(
                 path=job.video_instrumental_file,
                 media_type="video/mp4",
                 filename=f"{base_name}_instrumental.mp4",
@@ -533,28 +784,96 @@ async def procesar_video(
                 },
             )
 
+    except FileNotFoundError as e:
+        await db.rollback()
+        return ORJSONResponse({"error": str(e)}, status_code=500)
     except subprocess.CalledProcessError as e:
-        db.rollback()
-        return JSONResponse(
+        await db.rollback()
+        return ORJSONResponse(
             {"error": f"Error procesando el video: {str(e)}"},
             status_code=500,
         )
 
 
-def eliminar_archivo(path: str):
-    """Eliminar un archivo si existe."""
-    try:
-        if os.path.exists(path):
-            os.remove(path)
-            print(f"Deleted temp file: {path}")
-    except Exception as e:
-        print(f"Error deleting file {path}: {e}")
+async def procesar_video_en_segundo_plano(
+    job: Job, base_name: str, album_id: int, language: str
+):
+    """
+    Ejecuta el pipeline de un upload ya guardado, publicando cada
+    etapa como estado del job (/karaoke/estado y /estado-stream).
+    """
 
+    def etapa(estado: str, progreso: int, mensaje: str):
+        actualizar_estado_karaoke(job, estado, progreso, mensaje)
 
-@app.get("/descargar/todo/{job_id}")
-async def descargar_todo(
-    job_id: str, background_tasks: BackgroundTasks
+    # Sesión propia: la del request se cierra al responder el 202
+    async with SessionLocal() as db:
+        try:
+            karaoke_generado = await procesar_job_video(
+                job, base_name, album_id, language, db, etapa
+            )
+        except asyncio.CancelledError:
+            actualizar_estado_error_karaoke(
+                job, "Procesamiento cancelado"
+            )
+            raise
+        except Exception as e:
+            await db.rollback()
+            actualizar_estado_error_karaoke(
+                job, f"Error procesando el video: {e}"
+            )
+            return
+
+    etapa(
+        "done",
+        100,
+        (
+            "Video karaoke generado"
+            if karaoke_generado
+            else "Video instrumental generado (karaoke no generado)"
+        ),
+    )
+
+
+@app.post(
+    "/procesar-video/async",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=RespuestaEjecutar,
+)
+async def procesar_video_async(
+    album_id: int = Form(...),
+    file: UploadFile = File(...),
+    language: str = Form("auto"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
 ):
+    """
+    Igual que /procesar-video/, pero responde 202 con el job_id apenas
+    se guarda el upload. El progreso se consulta en
+    /karaoke/estado/{job_id} o /karaoke/estado-stream/{job_id} y los
+    archivos en /descargar/{tipo}/{job_id}.
+    """
+    await validar_album_propio(album_id, db, current_user)
+    base_name = nombre_base_upload(file)
+
+    job = Job()
+    await asyncio.to_thread(job.crear_directorios)
+    await guardar_upload(file, job)
+
+    actualizar_estado_karaoke(job, "queued", 0, "Video recibido")
+    lanzar_tarea_karaoke(
+        procesar_video_en_segundo_plano(
+            job, base_name, album_id, language
+        ),
+        job.id,
+    )
+    return RespuestaEjecutar(
+        job_id=job.id, status="queued", mensaje="Video recibido"
+    )
+
+
+@app.get("/descargar/todo/{job_id}")
+async def descargar_todo(job_id: str, comprimir_audio: bool = False):
     """
     Endpoint para descargar todos los archivos generados en un ZIP.
 
@@ -563,78 +882,72 @@ async def descargar_todo(
     - Audio original
     - Audio vocals
     - Audio instrumental
-    """
-    temp_zip_path = ""
 
+    El ZIP se genera al vuelo sin compresión (los medios ya están
+    comprimidos) y sin archivo temporal. Con `comprimir_audio=true`
+    los WAV (sin comprimir) se guardan con DEFLATE: el ZIP pesa menos
+    pero se envía sin Content-Length.
+    """
     try:
-        # Verificar que existen los archivos necesarios
-        files_to_zip = []
-
         job = Job(job_id)
 
-        # Video karaoke
-        if os.path.exists(job.video_karaoke_file):
-            files_to_zip.append(
-                (job.video_karaoke_file, f"{job_id}_karaoke.mp4")
-            )
-
-        # Audio original
-        if os.path.exists(job.audio_original_file):
-            files_to_zip.append(
-                (job.audio_original_file, f"{job_id}_original.wav")
-            )
-
-        # Audio vocals
-        if os.path.exists(job.audio_vocals_file):
-            files_to_zip.append(
-                (job.audio_vocals_file, f"{job_id}_vocals.wav")
-            )
-
-        # Audio instrumental
-        if os.path.exists(job.audio_instrumental_file):
-            files_to_zip.append(
-                (
-                    job.audio_instrumental_file,
-                    f"{job_id}_instrumental.wav",
-                )
-            )
+        # Verificar que existen los archivos necesarios: un scandir por
+        # directorio; el ZIP se arma solo con los que existen
+        candidatos = (
+            (job.video_karaoke_file, f"{job_id}_karaoke.mp4"),
+            (job.audio_original_file, f"{job_id}_original.wav"),
+            (job.audio_vocals_file, f"{job_id}_vocals.wav"),
+            (job.audio_instrumental_file, f"{job_id}_instrumental.wav"),
+        )
+        presentes = archivos_presentes(
+            *(ruta for ruta, _ in candidatos)
+        )
+        files_to_zip = [
+            (file_path, filename)
+            for file_path, filename in candidatos
+            if file_path in presentes
+        ]
 
         if not files_to_zip:
-            return JSONResponse(
+            return ORJSONResponse(
                 {"error": "No se encontraron archivos para descargar"},
                 status_code=404,
             )
 
-        # Crear ZIP temporal
-        with tempfile.NamedTemporaryFile(
-            delete=False, suffix=".zip"
-        ) as temp_zip:
-            temp_zip_path = temp_zip.name
-
-            with zipfile.ZipFile(
-                temp_zip_path, "w", zipfile.ZIP_DEFLATED
-            ) as zipf:
-                for file_path, filename in files_to_zip:
-                    if os.path.exists(file_path):
-                        zipf.write(file_path, filename)
-
-            # Asegurarse de que el ZIP es eliminado después de retornarlo
-            background_tasks.add_task(eliminar_archivo, temp_zip_path)
-
-            # Retornar el ZIP
-            return FileResponse(
-                path=temp_zip_path,
-                media_type="application/zip",
-                filename=f"{job_id}_completo.zip",
-                headers={
-                    "Content-Disposition": "attachment; "
-                    + f"filename={job_id}_completo.zip"
-                },
-            )
+        headers = {
+            "Content-Disposition": "attachment; "
+            + f"filename={job_id}_completo.zip",
+        }
+        if comprimir_audio:
+            # Solo los WAV se comprimen (nivel 1: rápido); el MP4 va
+            # tal cual. El tamaño final no se conoce de antemano
+            zip_stream = ZipStream(compress_type=ZIP_STORED)
+            for file_path, filename in files_to_zip:
+                if filename.endswith(".wav"):
+                    zip_stream.add_path(
+                        file_path,
+                        filename,
+                        compress_type=ZIP_DEFLATED,
+                        compress_level=1,
+                    )
+                else:
+                    zip_stream.add_path(file_path, filename)
+        else:
+            # ZIP_STORED: con tamaños conocidos se anuncia
+            # Content-Length
+            zip_stream = ZipStream(compress_type=ZIP_STORED, sized=True)
+            for file_path, filename in files_to_zip:
+                zip_stream.add_path(file_path, filename)
+            headers["Content-Length"] = str(len(zip_stream))
+
+        # StreamingResponse itera el ZipStream (síncrono) en el pool de
+        # hilos: lectura y DEFLATE no bloquean el event loop
+        return StreamingResponse(
+            zip_stream, media_type="application/zip", headers=headers
+        )
 
     except Exception as e:
-        eliminar_archivo(temp_zip_path)
-        return JSONResponse(
+        return ORJSONResponse(
             {"error": f"Error creando ZIP: {str(e)}"}, status_code=500
         )
 
@@ -702,12 +1015,16 @@ async def descargar_archivo(tipo: str, job_id: str):
             filename = f"{job_id}_thumbnail.jpg"
             disposition = "inline"
         else:
-            return JSONResponse(
+            return ORJSONResponse(
                 {"error": "Tipo de archivo no válido"}, status_code=400
             )
 
-        if not os.path.exists(file_path):
-            return JSONResponse(
+        # Un solo stat: sirve de chequeo de existencia y FileResponse lo
+        # reutiliza para Content-Length, ETag y los requests con Range
+        try:
+            st = os.stat(file_path)
+        except FileNotFoundError:
+            return ORJSONResponse(
                 {
                     "error": f"Archivo {tipo} no encontrado para job {job_id}"
                 },
@@ -718,206 +1035,193 @@ async def descargar_archivo(tipo: str, job_id: str):
             "Content-Disposition": f"{disposition}; filename={filename}"
         }
 
-        # Para preview, agregar headers adicionales para mejor reproducción
+        # Para preview, evitar que el navegador reproduzca una versión
+        # vieja. Accept-Ranges y las respuestas 206 las pone
+        # FileResponse: el reproductor salta sin re-descargar
         if tipo == "video_karaoke_preview":
-            headers.update(
-                {"Accept-Ranges": "bytes", "Cache-Control": "no-cache"}
-            )
+            headers["Cache-Control"] = "no-cache"
 
-        return FileResponse(
+        return ArchivoResponse(
             path=file_path,
             media_type=media_type,
             filename=filename,
             headers=headers,
+            stat_result=st,
         )
 
     except Exception as e:
-        return JSONResponse(
+        return ORJSONResponse(
             {"error": f"Error descargando archivo: {str(e)}"},
             status_code=500,
         )
 
 
-@app.get("/albums/{id}/videos")
-def get_album_videos(
+@app.get("/albums/{id}/videos", response_model=List[VideoResponse])
+async def get_album_videos(
     id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """
     Ruta para obtener los videos de un álbum.
     """
-    album = db.query(Album).filter(Album.id == id).first()
-    if not album:
+    # Dueño del álbum y sus videos en una sola consulta (LEFT JOIN: un
+    # álbum sin videos devuelve una fila con video None)
+    result = await db.execute(
+        select(Album.user_id, Video)
+        .outerjoin(Video, Video.album_id == Album.id)
+        .where(Album.id == id)
+        .order_by(Video.created_at)
+    )
+    filas = result.all()
+    if not filas:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Álbum no encontrado",
         )
-    if album.user_id != current_user.id:
+    if filas[0].user_id != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="No autorizado",
         )
 
-    return album.videos
+    return respuesta_validada(
+        VIDEOS_ADAPTER,
+        [fila.Video for fila in filas if fila.Video is not None],
+    )
 
 
 @app.get("/videos/{job_id}", response_model=VideoResponse)
-def get_video(
+async def get_video(
     job_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """
     Ruta para obtener un video.
     """
-    video = db.query(Video).filter(Video.job_id == job_id).first()
-    if not video:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Video no encontrado",
-        )
-    # Verificar que el álbum del video pertenezca al usuario del video (acceso indirecto)
-    # OJO: La tabla Video no tiene user_id directo, se accede via álbum.
-    album = db.query(Album).filter(Album.id == video.album_id).first()
-    if not album or album.user_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="No autorizado",
-        )
-    return video
+    video = await obtener_video_propio(job_id, db, current_user)
+    return respuesta_validada(VIDEO_ADAPTER, video)
 
 
 @app.put("/videos/{job_id}/album", response_model=VideoResponse)
-def move_video_album(
+async def move_video_album(
     job_id: str,
     target_album_id: int = Form(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """
     Ruta para mover un video a otro álbum.
     """
-    video = db.query(Video).filter(Video.job_id == job_id).first()
-    if not video:
+    # Video, dueño de su álbum y dueño del álbum destino (None si no
+    # existe) en una sola consulta
+    dueno_destino = (
+        select(Album.user_id)
+        .where(Album.id == target_album_id)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        select(Video, Album.user_id, dueno_destino)
+        .join(Album, Video.album_id == Album.id)
+        .where(Video.job_id == job_id)
+    )
+    fila = result.first()
+    if fila is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Video no encontrado",
         )
+    video, propietario, propietario_destino = fila
 
     # Verificar propiedad del video actual
-    current_album = (
-        db.query(Album).filter(Album.id == video.album_id).first()
-    )
-    if not current_album or current_album.user_id != current_user.id:
+    if propietario != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="No autorizado para este video",
         )
 
     # Verificar existencia y propiedad del álbum destino
-    target_album = (
-        db.query(Album).filter(Album.id == target_album_id).first()
-    )
-    if not target_album:
+    if propietario_destino is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Álbum destino no encontrado",
         )
-    if target_album.user_id != current_user.id:
+    if propietario_destino != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="No autorizado para el álbum destino",
         )
 
     video.album_id = target_album_id
-    db.commit()
-    db.refresh(video)
-    return video
+    await db.commit()
+    await db.refresh(video)
+    return respuesta_validada(VIDEO_ADAPTER, video)
 
 
 @app.put("/videos/{job_id}", response_model=VideoResponse)
-def update_video(
+async def update_video(
     job_id: str,
     payload: VideoUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """
     Ruta para actualizar un video.
     """
-    video = db.query(Video).filter(Video.job_id == job_id).first()
-    if not video:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Video no encontrado",
-        )
-
-    # Verificar propiedad (via álbum)
-    album = db.query(Album).filter(Album.id == video.album_id).first()
-    if not album or album.user_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="No autorizado",
-        )
+    video = await obtener_video_propio(job_id, db, current_user)
 
     if payload.name is not None:
         video.name = payload.name
 
-    db.commit()
-    db.refresh(video)
-    return video
+    await db.commit()
+    await db.refresh(video)
+    return respuesta_validada(VIDEO_ADAPTER, video)
+
+
+def borrar_directorio_job(job_id: str):
+    """
+    Elimina media/{job_id}. Se ejecuta como tarea de fondo (en el pool
+    de hilos); los errores solo se registran.
+    """
+    try:
+        job_instance = Job(job_id)
+        if os.path.exists(job_instance.job_dir):
+            shutil.rmtree(job_instance.job_dir)
+            print(f"Directorio eliminado: {job_instance.job_dir}")
+        else:
+            print(f"Directorio no encontrado: {job_instance.job_dir}")
+    except Exception as e:
+        print(f"Error eliminando directorio físico: {e}")
 
 
 @app.delete("/videos/{job_id}", status_code=204)
-def delete_video(
+async def delete_video(
     job_id: str,
-    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """
     Ruta para eliminar un video.
     """
-    video = db.query(Video).filter(Video.job_id == job_id).first()
-    if not video:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Video no encontrado",
-        )
+    video = await obtener_video_propio(job_id, db, current_user)
 
-    # Verificar propiedad (via álbum)
-    album = db.query(Album).filter(Album.id == video.album_id).first()
-    if not album or album.user_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="No autorizado",
-        )
+    # 1. Eliminar de la base de datos
+    await db.delete(video)
+    await db.commit()
 
-    # 1. Eliminar directorio físico (media/{job_id})
+    # 2. Eliminar directorio físico (media/{job_id}) después de
+    # responder: un rmtree de varios GB no retrasa la respuesta
     if video.job_id:
-        try:
-            job_instance = Job(video.job_id)
-            if os.path.exists(job_instance.job_dir):
-                shutil.rmtree(job_instance.job_dir)
-                print(f"Directorio eliminado: {job_instance.job_dir}")
-            else:
-                print(
-                    f"Directorio no encontrado: {job_instance.job_dir}"
-                )
-        except Exception as e:
-            print(f"Error eliminando directorio físico: {e}")
-            # No bloqueamos la eliminación de la DB, pero logueamos error
-
-    # 2. Eliminar de la base de datos
-    db.delete(video)
-    db.commit()
+        background_tasks.add_task(borrar_directorio_job, video.job_id)
     return
 
 
 @app.get("/albums", response_model=List[AlbumResponse])
-def get_albums(
+async def get_albums(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """
@@ -928,14 +1232,19 @@ def get_albums(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="No autorizado",
         )
-    albums = db.query(Album).filter(Album.user_id == user_id).all()
-    return albums
+    result = await db.execute(
+        select(Album)
+        .options(selectinload(Album.videos))
+        .where(Album.user_id == user_id)
+        .order_by(Album.created_at)
+    )
+    return respuesta_validada(ALBUMES_ADAPTER, result.scalars().all())
 
 
 @app.post("/albums", response_model=AlbumResponse)
-def create_album(
+async def create_album(
     payload: AlbumCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """
@@ -950,23 +1259,30 @@ def create_album(
         name=payload.name,
         description=payload.description,
         user_id=payload.user_id,
+        # Un álbum nuevo no tiene videos: la colección queda cargada
+        # para la respuesta sin refresh ni lazy load
+        videos=[],
     )
     db.add(album)
-    db.commit()
-    db.refresh(album)
-    return album
+    await db.commit()
+    return respuesta_validada(ALBUM_ADAPTER, album)
 
 
 @app.get("/albums/{id}", response_model=AlbumResponse)
-def read_album(
+async def read_album(
     id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """
     Ruta para obtener un álbum.
     """
-    album = db.query(Album).filter(Album.id == id).first()
+    result = await db.execute(
+        select(Album)
+        .options(selectinload(Album.videos))
+        .where(Album.id == id)
+    )
+    album = result.scalar_one_or_none()
     if not album:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -977,20 +1293,25 @@ def read_album(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="No autorizado",
         )
-    return album
+    return respuesta_validada(ALBUM_ADAPTER, album)
 
 
 @app.put("/albums/{id}", response_model=AlbumResponse)
-def update_album(
+async def update_album(
     id: int,
     payload: AlbumBase,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """
     Ruta para actualizar un álbum.
     """
-    album = db.query(Album).filter(Album.id == id).first()
+    result = await db.execute(
+        select(Album)
+        .options(selectinload(Album.videos))
+        .where(Album.id == id)
+    )
+    album = result.scalar_one_or_none()
     if not album:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1005,21 +1326,25 @@ def update_album(
         album.name = payload.name
     if payload.description is not None:
         album.description = payload.description
-    db.commit()
-    db.refresh(album)
-    return album
+    await db.commit()
+    return respuesta_validada(ALBUM_ADAPTER, album)
 
 
 @app.delete("/albums/{id}", status_code=204)
-def delete_album(
+async def delete_album(
     id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """
     Ruta para eliminar un álbum.
     """
-    album = db.query(Album).filter(Album.id == id).first()
+    result = await db.execute(
+        select(Album)
+        .options(selectinload(Album.videos))
+        .where(Album.id == id)
+    )
+    album = result.scalar_one_or_none()
     if not album:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1030,6 +1355,6 @@ def delete_album(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="No autorizado",
         )
-    db.delete(album)
-    db.commit()
+    await db.delete(album)
+    await db.commit()
     return
@@ -3,13 +3,23 @@ Módulo de modelos de la base de datos.
 Gestiona la creación de las tablas en la base de datos.
 """
 
-from datetime import datetime, timezone
-
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    func,
+)
 from sqlalchemy.orm import relationship
 
 from app.database import Base
 
+# Fecha de creación calculada por Postgres en el mismo INSERT (UTC, la
+# columna es timestamp sin zona) y devuelta con RETURNING
+AHORA_UTC = func.timezone("utc", func.now())
+
 
 class Video(Base):
     """
@@ -29,9 +39,7 @@ class Video(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
-    created_at = Column(
-        DateTime, default=lambda: datetime.now(timezone.utc)
-    )
+    created_at = Column(DateTime, server_default=AHORA_UTC)
     job_id = Column(String, nullable=False)
     duration_in_seconds = Column(Integer, nullable=False)
     format = Column(String, nullable=False)
@@ -39,6 +47,15 @@ class Video(Base):
 
     album = relationship("Album", back_populates="videos")
 
+    # Videos de un álbum en orden de creación con un solo recorrido
+    # del índice (también sirve para filtrar solo por album_id). El
+    # índice único de job_id tiene nombre propio: el
+    # `ix_videos_job_id` de versiones anteriores no era único
+    __table_args__ = (
+        Index("ix_videos_album_created", "album_id", "created_at"),
+        Index("ux_videos_job_id", "job_id", unique=True),
+    )
+
 
 class User(Base):
     """
@@ -59,9 +76,7 @@ class User(Base):
     name = Column(String, nullable=False)
     email = Column(String, unique=True, index=True, nullable=False)
     password = Column(String, nullable=False)
-    created_at = Column(
-        DateTime, default=lambda: datetime.now(timezone.utc)
-    )
+    created_at = Column(DateTime, server_default=AHORA_UTC)
     albums = relationship(
         "Album", back_populates="user", cascade="all, delete"
     )
@@ -87,11 +102,19 @@ class Album(Base):
     name = Column(String, nullable=False)
     description = Column(String, nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    created_at = Column(
-        DateTime, default=lambda: datetime.now(timezone.utc)
-    )
+    created_at = Column(DateTime, server_default=AHORA_UTC)
 
     user = relationship("User", back_populates="albums")
+    # selectin: al cargar varios álbumes, sus videos llegan en una
+    # sola consulta IN adicional (AlbumResponse siempre los incluye)
     videos = relationship(
-        "Video", back_populates="album", cascade="all, delete"
+        "Video",
+        back_populates="album",
+        cascade="all, delete",
+        lazy="selectin",
+        order_by="Video.created_at",
+    )
+
+    __table_args__ = (
+        Index("ix_albums_user_created", "user_id", "created_at"),
     )
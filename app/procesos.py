@@ -0,0 +1,157 @@
+"""
+Módulo de procesos externos.
+Ejecución asíncrona de comandos y clientes de procesos persistentes
+(`--servidor`) que atienden un trabajo JSON por línea en stdin.
+"""
+
+import asyncio
+import logging
+import os
+import subprocess
+from typing import List
+
+import orjson
+
+logger = logging.getLogger("procesos")
+
+PROJECT_ROOT = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..")
+)
+
+
+async def ejecutar_comando(cmd: List[str]) -> bytes:
+    """
+    Ejecuta un comando externo sin bloquear el event loop.
+
+    Returns:
+        bytes: Salida estándar del comando.
+
+    Raises:
+        subprocess.CalledProcessError: Si el comando termina con error.
+        asyncio.CancelledError: Si se cancela la tarea (el proceso
+        también se termina).
+    """
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+    except NotImplementedError:
+        # Event loop sin soporte de subprocesos (p. ej. Windows con
+        # --reload): ejecutar en un hilo
+        resultado = await asyncio.to_thread(
+            subprocess.run, cmd, capture_output=True, check=True
+        )
+        return resultado.stdout
+    try:
+        salida, errores = await proc.communicate()
+    except asyncio.CancelledError:
+        # Tarea cancelada (apagado): no dejar el proceso huérfano
+        proc.kill()
+        await asyncio.shield(proc.wait())
+        raise
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(
+            proc.returncode, cmd, salida, errores
+        )
+    return salida
+
+
+class ProcesoPersistente:
+    """
+    Cliente de un script lanzado con `--servidor` en otro intérprete.
+
+    Los trabajos se serializan: el proceso atiende uno a la vez y
+    responde con una línea JSON por trabajo (`{"ok": true, ...}` o
+    `{"ok": false, "error": ...}`). Si el proceso muere se vuelve a
+    lanzar en la siguiente llamada.
+    """
+
+    def __init__(self, nombre: str, python: str, script: str) -> None:
+        self.nombre = nombre
+        self._cmd = [python, "-u", script, "--servidor"]
+        self._proc: asyncio.subprocess.Process | None = None
+        self._lock = asyncio.Lock()
+
+    async def _proceso(self) -> asyncio.subprocess.Process:
+        if self._proc is None or self._proc.returncode is not None:
+            self._proc = await asyncio.create_subprocess_exec(
+                *self._cmd,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                cwd=PROJECT_ROOT,
+            )
+            logger.info(
+                "Worker %s iniciado (pid %s)",
+                self.nombre,
+                self._proc.pid,
+            )
+        return self._proc
+
+    async def iniciar(self) -> bool:
+        """
+        Lanza el proceso por adelantado.
+
+        Returns:
+            bool: False si no se puede (intérprete ausente o event loop
+            sin subprocesos).
+        """
+        async with self._lock:
+            try:
+                await self._proceso()
+            except (OSError, NotImplementedError) as e:
+                logger.warning(
+                    "Worker %s no disponible: %s", self.nombre, e
+                )
+                return False
+        return True
+
+    async def ejecutar(self, trabajo: dict) -> dict:
+        """
+        Envía un trabajo y espera su respuesta.
+
+        Raises:
+            subprocess.CalledProcessError: Si el trabajo falla o el
+            proceso termina sin responder.
+        """
+        async with self._lock:
+            proc = await self._proceso()
+            try:
+                proc.stdin.write(orjson.dumps(trabajo) + b"\n")
+                await proc.stdin.drain()
+                linea = await proc.stdout.readline()
+            except BaseException:
+                # Una respuesta pendiente desincronizaría el protocolo
+                # para el siguiente trabajo: descartar el proceso
+                proc.kill()
+                await proc.wait()
+                raise
+            if not linea:
+                codigo = await proc.wait()
+                raise subprocess.CalledProcessError(
+                    codigo,
+                    self._cmd,
+                    stderr=f"{self.nombre} terminó sin responder",
+                )
+
+        respuesta = orjson.loads(linea)
+        if not respuesta.get("ok"):
+            raise subprocess.CalledProcessError(
+                1, self._cmd, stderr=respuesta["error"]
+            )
+        return respuesta
+
+    async def detener(self) -> None:
+        """
+        Cierra stdin del proceso (fin del bucle) y espera su salida.
+        """
+        proc, self._proc = self._proc, None
+        if proc is None or proc.returncode is not None:
+            return
+        proc.stdin.close()
+        try:
+            await asyncio.wait_for(proc.wait(), timeout=10)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
@@ -0,0 +1,120 @@
+"""
+Módulo de respuestas.
+Respuestas HTTP personalizadas para servir archivos generados.
+"""
+
+import os
+from email.utils import parsedate
+from urllib.parse import quote
+
+from fastapi.responses import FileResponse, Response
+from pydantic import TypeAdapter
+from starlette.datastructures import Headers
+
+from app.job import MEDIA_DIR
+
+# Cabeceras que se repiten en un 304 (RFC 9110 §15.4.5)
+_CABECERAS_304 = ("cache-control", "content-location", "etag", "vary")
+# Prefijo de la location `internal` de nginx que apunta a media/ (p. ej.
+# `/internal/media/`). Si está definido, nginx envía los archivos con
+# sendfile y la aplicación solo responde las cabeceras
+MEDIA_ACCEL_REDIRECT = os.getenv("MEDIA_ACCEL_REDIRECT", "")
+# Cabeceras que se conservan al delegar el envío a nginx (tamaño, ETag
+# y rangos los calcula nginx a partir del archivo)
+_CABECERAS_ACCEL = (
+    "cache-control",
+    "content-disposition",
+    "content-type",
+)
+
+
+def respuesta_validada(adaptador: TypeAdapter, datos) -> Response:
+    """
+    Valida objetos ORM contra el esquema de `adaptador` y los serializa
+    a JSON directamente en pydantic-core, sin el paso intermedio de
+    FastAPI por diccionarios (`response_model` queda para la
+    documentación).
+    """
+    modelos = adaptador.validate_python(datos, from_attributes=True)
+    return Response(
+        adaptador.dump_json(modelos), media_type="application/json"
+    )
+
+
+class ArchivoResponse(FileResponse):
+    """
+    FileResponse para archivos multimedia grandes.
+
+    Si el servidor ASGI soporta la extensión `http.response.pathsend`
+    (p. ej. Granian), Starlette delega el envío al servidor, que usa
+    sendfile sin copiar el archivo por Python. En caso contrario (p. ej.
+    uvicorn) el archivo se lee en bloques de 1 MiB en lugar de 64 KiB,
+    reduciendo las lecturas y los envíos por archivo. Los requests con
+    `Range` siguen siendo atendidos por FileResponse.
+
+    Con `stat_result` (ETag y Last-Modified ya calculados) responde
+    `304 Not Modified` a los GET condicionales cuyo archivo no cambió,
+    sin abrir ni enviar el archivo.
+
+    Detrás de nginx con MEDIA_ACCEL_REDIRECT, los archivos de media/ se
+    delegan con `X-Accel-Redirect` y no pasan por Python.
+    """
+
+    chunk_size = 1024 * 1024
+
+    def _no_modificado(self, request_headers: Headers) -> bool:
+        etag = self.headers.get("etag")
+        if etag is None:
+            return False
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            # If-Modified-Since se ignora si viene If-None-Match
+            etiquetas = [
+                t.strip(" W/") for t in if_none_match.split(",")
+            ]
+            return if_none_match.strip() == "*" or etag in etiquetas
+        if_modified_since = parsedate(
+            request_headers.get("if-modified-since", "")
+        )
+        last_modified = parsedate(self.headers.get("last-modified", ""))
+        return (
+            if_modified_since is not None
+            and last_modified is not None
+            and if_modified_since >= last_modified
+        )
+
+    def _ruta_accel(self) -> str | None:
+        if not MEDIA_ACCEL_REDIRECT:
+            return None
+        ruta = os.path.relpath(self.path, MEDIA_DIR)
+        if ruta.startswith(".."):
+            return None
+        prefijo = MEDIA_ACCEL_REDIRECT.rstrip("/")
+        return f"{prefijo}/{quote(ruta.replace(os.sep, '/'))}"
+
+    async def __call__(self, scope, receive, send) -> None:
+        ruta_accel = self._ruta_accel()
+        if ruta_accel is not None:
+            headers = {
+                nombre: valor
+                for nombre, valor in self.headers.items()
+                if nombre in _CABECERAS_ACCEL
+            }
+            headers["X-Accel-Redirect"] = ruta_accel
+            respuesta = Response(headers=headers)
+            await respuesta(scope, receive, send)
+            return
+        if scope["method"] in ("GET", "HEAD") and self._no_modificado(
+            Headers(scope=scope)
+        ):
+            respuesta = Response(
+                status_code=304,
+                headers={
+                    nombre: valor
+                    for nombre, valor in self.headers.items()
+                    if nombre in _CABECERAS_304
+                },
+            )
+            await respuesta(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
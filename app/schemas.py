@@ -6,7 +6,12 @@ Gestiona la creación de los esquemas de datos para la base de datos.
 from datetime import datetime
 from typing import List, Optional
 
-from pydantic import BaseModel, EmailStr
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    EmailStr,
+    TypeAdapter,
+)
 
 
 class UserBase(BaseModel):
@@ -28,8 +33,7 @@ class UserResponse(UserBase):
     id: int
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, frozen=True)
 
 
 class LoginRequest(BaseModel):
@@ -75,8 +79,7 @@ class VideoResponse(VideoBase):
     id: int
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, frozen=True)
 
 
 class AlbumBase(BaseModel):
@@ -107,5 +110,13 @@ class AlbumResponse(AlbumBase):
     created_at: datetime
     videos: List[VideoResponse] = []
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, frozen=True)
+
+
+# Validadores/serializadores construidos una sola vez: las rutas de
+# álbumes y videos validan desde el ORM y serializan a JSON en
+# pydantic-core en una sola pasada
+ALBUM_ADAPTER = TypeAdapter(AlbumResponse)
+ALBUMES_ADAPTER = TypeAdapter(List[AlbumResponse])
+VIDEO_ADAPTER = TypeAdapter(VideoResponse)
+VIDEOS_ADAPTER = TypeAdapter(List[VideoResponse])
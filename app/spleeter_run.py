@@ -0,0 +1,72 @@
+"""
+Módulo de separación de stems.
+Servidor de Spleeter (se ejecuta con el intérprete de `venv`): carga el
+modelo una sola vez y separa los audios que recibe por stdin.
+"""
+
+import argparse
+import json
+import os
+import sys
+import traceback
+
+
+def servir() -> None:
+    """
+    Atiende trabajos JSON por stdin, uno por línea.
+
+    Cada línea `{"audio", "destino"}` escribe
+    `destino/<nombre>/{vocals,accompaniment}.wav` y produce una única
+    línea JSON de respuesta en stdout (`{"ok": true}` o
+    `{"ok": false, "error": ...}`). Los diagnósticos van a stderr.
+    """
+    # Reservar el stdout real para las respuestas y redirigir el fd 1 a
+    # stderr, para que TensorFlow no mezcle texto con el protocolo
+    salida = os.fdopen(os.dup(1), "w", encoding="utf-8", buffering=1)
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+
+    from spleeter.separator import Separator
+
+    modelo = os.getenv("SPLEETER_MODELO", "spleeter:2stems")
+    print(f"[Spleeter] Cargando modelo {modelo}...", file=sys.stderr)
+    separador = Separator(modelo)
+
+    for linea in sys.stdin:
+        if not linea.strip():
+            continue
+        try:
+            trabajo = json.loads(linea)
+            separador.separate_to_file(
+                trabajo["audio"], trabajo["destino"]
+            )
+            respuesta = {"ok": True}
+        except Exception as e:
+            traceback.print_exc(file=sys.stderr)
+            respuesta = {
+                "ok": False,
+                "error": f"{type(e).__name__}: {e}",
+            }
+        salida.write(json.dumps(respuesta) + "\n")
+
+
+def main() -> None:
+    """
+    Punto de entrada: solo existe el modo servidor.
+    """
+    parser = argparse.ArgumentParser(
+        description="Servidor de separación de stems con Spleeter."
+    )
+    parser.add_argument(
+        "--servidor",
+        action="store_true",
+        help="Atender trabajos JSON por stdin con el modelo cargado",
+    )
+    args = parser.parse_args()
+    if not args.servidor:
+        parser.error("use --servidor")
+    servir()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Módulo de los procesos Spleeter persistentes.
+Mantiene `spleeter_run.py --servidor` vivo en `venv` para importar
+TensorFlow y cargar el modelo 2stems una sola vez por proceso en lugar
+de lanzar `spleeter.exe` en cada video.
+"""
+
+import asyncio
+import os
+
+from app.procesos import (
+    PROJECT_ROOT,
+    ProcesoPersistente,
+    ejecutar_comando,
+)
+
+SCRIPT_PATH = os.path.join(PROJECT_ROOT, "app", "spleeter_run.py")
+SPLEETER_PY = os.getenv(
+    "SPLEETER_PY",
+    os.path.join(PROJECT_ROOT, "venv", "Scripts", "python.exe"),
+)
+# Ruta completa del ejecutable spleeter en el entorno virtual (modo
+# sin worker)
+SPLEETER_EXE = os.path.join(
+    PROJECT_ROOT, "venv", "Scripts", "spleeter.exe"
+)
+# Cada Spleeter carga TensorFlow y ocupa GB de RAM: máximo de
+# separaciones simultáneas (y de procesos persistentes)
+SPLEETER_CONCURRENCY = int(os.getenv("SPLEETER_CONCURRENCY", "2"))
+SPLEETER_WORKER = os.getenv("SPLEETER_WORKER", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+
+class SeparadorSpleeter:
+    """
+    Pool de hasta SPLEETER_CONCURRENCY procesos Spleeter persistentes.
+    El primero se lanza al arrancar y el resto la primera vez que hay
+    separaciones simultáneas.
+    """
+
+    def __init__(self) -> None:
+        self._sem = asyncio.Semaphore(SPLEETER_CONCURRENCY)
+        self._libres = [
+            ProcesoPersistente(
+                f"Spleeter-{i}", SPLEETER_PY, SCRIPT_PATH
+            )
+            for i in range(SPLEETER_CONCURRENCY)
+        ]
+        self._todos = list(self._libres)
+        self._activo = SPLEETER_WORKER
+
+    async def iniciar(self) -> None:
+        """
+        Lanza el primer proceso. Si no se puede se usa `spleeter.exe`
+        en un proceso nuevo por video.
+        """
+        if self._activo:
+            self._activo = await self._libres[-1].iniciar()
+
+    async def separar(self, audio: str, destino: str) -> None:
+        """
+        Separa `audio` en `destino/<nombre>/{vocals,accompaniment}.wav`
+        (misma estructura que `spleeter separate -o destino`). Las
+        separaciones que exceden el cupo esperan turno.
+
+        Raises:
+            subprocess.CalledProcessError: Si la separación falla.
+        """
+        async with self._sem:
+            if not self._activo:
+                await ejecutar_comando(
+                    [
+                        SPLEETER_EXE,
+                        "separate",
+                        "-p",
+                        "spleeter:2stems",
+                        "-o",
+                        destino,
+                        audio,
+                    ]
+                )
+                return
+            # El semáforo garantiza que siempre queda uno libre
+            proceso = self._libres.pop()
+            try:
+                await proceso.ejecutar(
+                    {"audio": audio, "destino": destino}
+                )
+            finally:
+                self._libres.append(proceso)
+
+    async def detener(self) -> None:
+        """Cierra todos los procesos Spleeter persistentes."""
+        await asyncio.gather(*(p.detener() for p in self._todos))
+
+
+separador_spleeter = SeparadorSpleeter()
@@ -4,6 +4,7 @@ Permite la creación de subtitulos.
 """
 
 import re
+from functools import lru_cache
 
 DEFAULT_VIDEO = {
     "width": 1920,
@@ -30,25 +31,61 @@ DEFAULT_STYLE = {
     "alignment": 2,  # bottom-center
 }
 
-VOWELS = set("aeiouáéíóúüAEIOUÁÉÍÓÚÜ")
+VOWELS = frozenset("aeiouáéíóúüAEIOUÁÉÍÓÚÜ")
+_DIGRAFOS = frozenset(("ch", "ll", "rr"))
+# Clases de carácter para split_syllables
+_OTRO, _VOCAL, _CONSONANTE = 0, 1, 2
+
+# Patrones compilados una sola vez (se usan por cada bloque del SRT)
+_TIEMPO_SRT = re.compile(r"(\d{2}):(\d{2}):(\d{2}),(\d{3})")
+_LINEA_TIEMPOS = re.compile(r"([\d:,]+)\s*-->\s*([\d:,]+)")
+# Etiqueta de karaoke de duración cero (puntuación y símbolos)
+_KF0 = "{\\kf0}"
+
+
+def _separar_hms(ms: int):
+    """
+    Descompone milisegundos en (horas, minutos, segundos, milisegundos)
+    con aritmética entera.
+    """
+    h, ms = divmod(ms, 3600000)
+    m, ms = divmod(ms, 60000)
+    s, ms = divmod(ms, 1000)
+    return h, m, s, ms
 
 
 def segundos_a_tiempo_srt(segundos: float) -> str:
     """
     Convierte segundos a tiempo en formato SRT.
     """
-    segundos = float(segundos)
-    horas, resto = divmod(segundos, 3600)
-    minutos, resto = divmod(resto, 60)
-    segs, frac = divmod(resto, 1)
-    return f"{horas:02.0f}:{minutos:02.0f}:{segs:02.0f},{(frac * 1000):03.0f}"
+    h, m, s, ms = _separar_hms(int(round(segundos * 1000)))
+    return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
 
 
 def parse_time_to_ms(time_str: str) -> int:
     """
     Convierte un tiempo en formato SRT a milisegundos.
     """
-    m = re.match(r"(\d{2}):(\d{2}):(\d{2}),(\d{3})", time_str)
+    # Camino rápido para el formato de ancho fijo HH:MM:SS,mmm
+    if (
+        len(time_str) == 12
+        and time_str[2] == time_str[5] == ":"
+        and time_str[8] == ","
+    ):
+        h, mm, s, ms = (
+            time_str[0:2],
+            time_str[3:5],
+            time_str[6:8],
+            time_str[9:12],
+        )
+        if (h + mm + s + ms).isdecimal():
+            return (
+                int(h) * 3600000
+                + int(mm) * 60000
+                + int(s) * 1000
+                + int(ms)
+            )
+    m = _TIEMPO_SRT.match(time_str)
     if not m:
         raise ValueError(f"Formato de tiempo inválido: {time_str}")
     h, mm, s, ms = map(int, m.groups())
@@ -58,91 +95,109 @@ def parse_time_to_ms(time_str: str) -> int:
 def parse_srt_word_level(path: str):
     """
     Parsea un archivo SRT y devuelve una lista de palabras con sus tiempos de inicio y fin.
+
+    Recorre el archivo línea a línea: cada bloque (índice, tiempos y
+    texto) se procesa al encontrar una línea en blanco, sin leer el
+    archivo completo ni armar la lista de bloques.
     """
-    with open(path, "r", encoding="utf-8") as f:
-        content = f.read().strip()
-    blocks = re.split(r"\n\s*\n", content)
     words = []
-    for block in blocks:
-        lines = block.strip().split("\n")
-        if len(lines) < 3:
-            continue
-        tline = lines[1]
-        m = re.match(r"([\d:,]+)\s*-->\s*([\d:,]+)", tline)
+    bloque = []
+
+    def cerrar_bloque():
+        if len(bloque) < 3:
+            return
+        m = _LINEA_TIEMPOS.match(bloque[1])
         if not m:
-            continue
+            return
         start_ms = parse_time_to_ms(m.group(1))
         end_ms = parse_time_to_ms(m.group(2))
-        text = " ".join(lines[2:]).strip()
+        text = " ".join(bloque[2:]).strip()
         if text:
             words.append(
                 {"text": text, "start_ms": start_ms, "end_ms": end_ms}
             )
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.isspace():
+                cerrar_bloque()
+                bloque.clear()
+            else:
+                bloque.append(line.rstrip("\n"))
+    cerrar_bloque()
     return words
 
 
+def _clasificar(ch: str) -> int:
+    """
+    Clase de un carácter para la división en sílabas.
+    """
+    if ch in VOWELS:
+        return _VOCAL
+    return _CONSONANTE if ch.isalpha() else _OTRO
+
+
+# Tabla precalculada hasta Latín extendido-B (incluye las vocales con
+# tilde y la ñ); otros caracteres se clasifican al vuelo
+_CLASES = {chr(c): _clasificar(chr(c)) for c in range(0x250)}
+
+
+@lru_cache(maxsize=8192)
 def split_syllables(word: str):
     """
     Divide una palabra en sílabas.
+
+    Las mismas palabras se repiten mucho en una canción (estribillos):
+    el resultado se cachea y por eso es una tupla (inmutable). Cada
+    carácter se clasifica una sola vez (tabla precalculada) y el resto
+    del algoritmo compara enteros.
     """
     if not word:
-        return [word]
-    if all(not ch.isalpha() for ch in word):
-        return [word]
+        return (word,)
+    n = len(word)
+    # Dos centinelas _OTRO al final: los índices j y j + 1 nunca se
+    # salen de la lista
+    clases = [
+        _CLASES[ch] if ch in _CLASES else _clasificar(ch) for ch in word
+    ] + [_OTRO, _OTRO]
+    if all(c == _OTRO for c in clases):
+        return (word,)
 
     parts = []
     i = 0
-    n = len(word)
-
-    def is_consonant(idx: int):
-        return (
-            0 <= idx < n
-            and word[idx].isalpha()
-            and word[idx] not in VOWELS
-        )
-
-    def is_vowel(idx: int):
-        return 0 <= idx < n and word[idx] in VOWELS
-
     while i < n:
         j = i
-        if not word[j].isalpha():
+        if clases[j] == _OTRO:
             parts.append(word[j])
             i = j + 1
             continue
 
-        if is_consonant(j):
-            if j + 1 < n:
-                digraph = word[j : j + 2].lower()
-                if digraph in ("ch", "ll", "rr"):
-                    j += 2
-                else:
-                    j += 1
+        if clases[j] == _CONSONANTE:
+            if j + 1 < n and word[j : j + 2].lower() in _DIGRAFOS:
+                j += 2
             else:
                 j += 1
 
-        if is_vowel(j):
-            while is_vowel(j):
+        if clases[j] == _VOCAL:
+            while clases[j] == _VOCAL:
                 j += 1
         else:
             parts.append(word[i:j])
             i = j
             continue
 
-        if is_consonant(j) and is_consonant(j + 1):
+        # Consonante seguida de consonante o vocal: inicia la sílaba
+        # siguiente; si no, cierra la actual
+        if clases[j] == _CONSONANTE and clases[j + 1] != _OTRO:
             parts.append(word[i:j])
             i = j
         else:
-            if is_consonant(j) and is_vowel(j + 1):
-                parts.append(word[i:j])
-                i = j
-            else:
-                if is_consonant(j):
-                    j += 1
-                parts.append(word[i:j])
-                i = j
+            if clases[j] == _CONSONANTE:
+                j += 1
+            parts.append(word[i:j])
+            i = j
 
-    return [p for p in parts if p]
+    return tuple(p for p in parts if p)
 
 
 def estimate_char_width(font_size: int) -> float:
@@ -163,48 +218,50 @@ def available_width(cfg_video) -> float:
     )
 
 
-def should_wrap_line(current_words, next_word, cfg_video) -> bool:
-    """
-    Determina si se debe envolver una línea de texto.
-    """
-    if not current_words:
-        return False
-    current_text = " ".join(w["text"] for w in current_words)
-    cand = f"{current_text} {next_word['text']}"
-    char_w = estimate_char_width(cfg_video["font_size"])
-    return len(cand) * char_w > available_width(cfg_video)
-
-
 def group_words(words, cfg_video, cfg_group):
     """
     Agrupa las palabras en frases.
+
+    El largo en caracteres de cada frase (textos unidos por espacios)
+    se lleva como contador en lugar de volver a unir los textos por
+    cada palabra.
     """
     if not words:
         return []
 
+    # Constantes para toda la transcripción: fuera de los bucles
+    char_w = estimate_char_width(cfg_video["font_size"])
+    avail_w = available_width(cfg_video)
+    pause_threshold = cfg_group["pause_threshold_ms"]
+
     phrases = []
+    phrase_chars = []
     current = [words[0]]
+    current_chars = len(words[0]["text"])
 
     for i in range(1, len(words)):
         prev_w = words[i - 1]
         w = words[i]
         pause = w["start_ms"] - prev_w["end_ms"]
+        cand_chars = current_chars + 1 + len(w["text"])
 
         should_split = (
-            pause > cfg_group["pause_threshold_ms"]
+            pause > pause_threshold
             or prev_w["text"].rstrip().endswith((".", "!", "?"))
             and pause > 500
-            or should_wrap_line(current, w, cfg_video)
+            or cand_chars * char_w > avail_w
         )
         if should_split:
-            if current:
-                phrases.append(current)
+            phrases.append(current)
+            phrase_chars.append(current_chars)
             current = [w]
+            current_chars = len(w["text"])
         else:
             current.append(w)
+            current_chars = cand_chars
 
-    if current:
-        phrases.append(current)
+    phrases.append(current)
+    phrase_chars.append(current_chars)
 
     optimized = []
     i = 0
@@ -213,13 +270,10 @@ def group_words(words, cfg_video, cfg_group):
         if len(cur) < 4 and i + 1 < len(phrases):
             nxt = phrases[i + 1]
             pause_between = nxt[0]["start_ms"] - cur[-1]["end_ms"]
-            comb = cur + nxt
-            char_w = estimate_char_width(cfg_video["font_size"])
-            fits = len(
-                " ".join(w["text"] for w in comb)
-            ) * char_w <= available_width(cfg_video)
+            comb_chars = phrase_chars[i] + 1 + phrase_chars[i + 1]
+            fits = comb_chars * char_w <= avail_w
             if pause_between < 600 and fits:
-                optimized.append(comb)
+                optimized.append(cur + nxt)
                 i += 2
                 continue
         optimized.append(cur)
@@ -232,11 +286,8 @@ def ms_to_ass_time(ms: int) -> str:
     """
     Convierte milisegundos a tiempo en formato ASS.
     """
-    h = ms // 3600000
-    m = (ms % 3600000) // 60000
-    s = (ms % 60000) // 1000
-    cs = (ms % 1000) // 10
-    return f"{h}:{m:02d}:{s:02d}.{cs:02d}"
+    h, m, s, ms = _separar_hms(ms)
+    return f"{h}:{m:02d}:{s:02d}.{ms // 10:02d}"
 
 
 def ass_header(cfg_video, style) -> str:
@@ -282,10 +333,11 @@ def ass_line(phrase_words, _cfg_video) -> str:
     def has_letters(tok: str) -> bool:
         return any(ch.isalpha() for ch in tok)
 
-    karaoke_text = ""
+    # Fragmentos unidos al final con un solo join
+    partes = []
     for idx, w in enumerate(phrase_words):
         dur_cs = max(0, round((w["end_ms"] - w["start_ms"]) / 10))
-        tokens = split_syllables(w["text"]) or [w["text"]]
+        tokens = split_syllables(w["text"]) or (w["text"],)
         timed_tokens = [t for t in tokens if has_letters(t)]
         timed_total_chars = sum(len(t) for t in timed_tokens)
 
@@ -293,10 +345,10 @@ def ass_line(phrase_words, _cfg_video) -> str:
             first = True
             for tok in tokens:
                 if first and dur_cs > 0:
-                    karaoke_text += f"{{\\kf{dur_cs}}}{tok}"
+                    partes.append(f"{{\\kf{dur_cs}}}{tok}")
                     first = False
                 else:
-                    karaoke_text += f"{{\\kf0}}{tok}"
+                    partes.append(_KF0 + tok)
         else:
             allocated_cs = 0
             remaining_timed = sum(1 for t in tokens if has_letters(t))
@@ -315,16 +367,17 @@ def ass_line(phrase_words, _cfg_video) -> str:
                         )
                         cs = max(1, round(exact)) if dur_cs > 0 else 0
                     allocated_cs += cs
-                    karaoke_text += f"{{\\kf{cs}}}{tok}"
+                    partes.append(f"{{\\kf{cs}}}{tok}")
                 else:
-                    karaoke_text += f"{{\\kf0}}{tok}"
+                    partes.append(_KF0 + tok)
 
         if idx < len(phrase_words) - 1:
             nxt = phrase_words[idx + 1]
             pause_ms = max(0, nxt["start_ms"] - w["end_ms"])
             pause_cs = max(0, round(pause_ms / 10))
-            karaoke_text += f"{{\\kf{pause_cs}}} "
+            partes.append(f"{{\\kf{pause_cs}}} ")
 
+    karaoke_text = "".join(partes)
     return f"Dialogue: 0,{start},{end},Karaoke,,0,0,0,,{karaoke_text}"
 
 
@@ -332,10 +385,16 @@ def write_ass(phrases, output_path: str, cfg_video, style) -> None:
     """
     Escribe las frases en un archivo de subtitulos en formato ASS.
     """
-    header = ass_header(cfg_video, style)
-    lines = [ass_line(p, cfg_video) for p in phrases]
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(header + "\n".join(lines))
+    # Las líneas se generan y escriben una a una (búfer de 1 MiB) sin
+    # armar el archivo completo en memoria; separadas por "\n" como
+    # antes, sin salto final
+    lineas = (ass_line(p, cfg_video) for p in phrases)
+    with open(
+        output_path, "w", encoding="utf-8", buffering=1024 * 1024
+    ) as f:
+        f.write(ass_header(cfg_video, style))
+        f.write(next(lineas, ""))
+        f.writelines("\n" + linea for linea in lineas)
 
 
 def convertir_srt_a_ass(
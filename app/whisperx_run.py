@@ -4,38 +4,13 @@ Gestiona la transcripción de audio a SRT palabra a palabra con WhisperX (optimi
 """
 
 import argparse
+import json
 import os
 import sys
-from collections import defaultdict
+import traceback
+from functools import lru_cache
 from pathlib import Path
-from typing import Any
-
-import torch.serialization
-from omegaconf.base import Metadata
-from omegaconf.listconfig import ContainerMetadata, ListConfig
-from omegaconf.nodes import AnyNode
-from pyannote.audio.core.model import Introspection
-from pyannote.audio.core.task import Problem, Resolution, Specifications
-from torch.torch_version import TorchVersion
-
-torch.serialization.add_safe_globals(
-    [
-        ListConfig,
-        ContainerMetadata,
-        Any,
-        list,
-        defaultdict,
-        dict,
-        int,
-        AnyNode,
-        Metadata,
-        TorchVersion,
-        Introspection,
-        Specifications,
-        Problem,
-        Resolution,
-    ]
-)
+from typing import Any, Iterator
 
 
 def env(name: str, default: str | None = None) -> str | None:
@@ -59,6 +34,545 @@ def as_int(name: str, default: int) -> int:
         return default
 
 
+# Modelo ASR ya cargado: en modo servidor cada trabajo reutiliza el
+# modelo en memoria en lugar de volver a leerlo de disco. Se guarda uno
+# solo (el idioma se pasa en cada transcripción); si cambia la
+# configuración se libera antes de cargar el nuevo
+_MODELOS: dict[tuple, Any] = {}
+
+# Modelos de alineación ya cargados, por idioma y device
+_ALINEADORES: dict[tuple, tuple] = {}
+
+# Directorio local donde se guardan los modelos CTranslate2 ya
+# convertidos (por defecto la caché de Hugging Face) e hilos de
+# CTranslate2 en CPU (por defecto la mitad de los núcleos lógicos, uno
+# por núcleo físico con SMT)
+MODEL_DIR = env("WHISPERX_MODEL_DIR")
+CPU_THREADS = as_int(
+    "WHISPERX_CPU_THREADS", max(1, (os.cpu_count() or 2) // 2)
+)
+
+# Batches posibles en CUDA y MiB aproximados por elemento del batch
+# según el modelo, para elegir el mayor que deje 1 GiB de VRAM libre
+BATCHES_CUDA = (4, 8, 16, 24, 32, 48, 64)
+# (large-v3-turbo: el encoder de large-v3 con 4 capas de decoder en
+# lugar de 32, por lo que la caché KV por elemento es mucho menor)
+_MIB_POR_ELEMENTO = {
+    "medium": 80,
+    "large-v2": 150,
+    "large-v3": 170,
+    "large-v3-turbo": 110,
+}
+
+# Extensiones de audio esperadas (otras solo generan un aviso)
+EXTENSIONES_AUDIO = frozenset({".wav", ".mp3", ".m4a", ".flac", ".ogg"})
+
+# Backend ASR: `whisperx` (pipeline de WhisperX) o `faster`
+# (BatchedInferencePipeline de faster-whisper con su VAD Silero)
+BACKENDS = ("whisperx", "faster")
+
+
+def configurar_cuda(torch: Any) -> None:
+    """
+    Habilita TF32 en las matmul y convoluciones de torch (alineación
+    wav2vec2 y VAD). La atención del ASR corre en CTranslate2, que no
+    usa estos ajustes.
+    """
+    torch.backends.cuda.matmul.allow_tf32 = True
+    torch.backends.cudnn.allow_tf32 = True
+
+
+def configurar_cpu() -> None:
+    """
+    Ajustes de oneDNN y del allocator de torch para CPU, salvo que ya
+    estén definidos en el entorno: matmul FP32 rebajadas a BF16 donde
+    el hardware lo soporta (p. ej. Arm Neoverse), huge pages para los
+    pesos y más primitivas oneDNN en caché. Se leen en el primer uso,
+    por lo que basta con fijarlos antes de cargar los modelos.
+    """
+    os.environ.setdefault("DNNL_DEFAULT_FPMATH_MODE", "BF16")
+    os.environ.setdefault("THP_MEM_ALLOC_ENABLE", "1")
+    os.environ.setdefault("LRU_CACHE_CAPACITY", "1024")
+
+
+@lru_cache(maxsize=1)
+def registrar_globales_seguras() -> None:
+    """
+    Permite a `torch.load` (weights_only) deserializar el checkpoint del
+    VAD de pyannote. Importa omegaconf y pyannote, que arrastran torch y
+    lightning, por lo que se hace una sola vez y solo al cargar el
+    modelo de WhisperX.
+    """
+    from collections import defaultdict
+
+    import torch.serialization
+    from omegaconf.base import Metadata
+    from omegaconf.listconfig import ContainerMetadata, ListConfig
+    from omegaconf.nodes import AnyNode
+    from pyannote.audio.core.model import Introspection
+    from pyannote.audio.core.task import (
+        Problem,
+        Resolution,
+        Specifications,
+    )
+    from torch.torch_version import TorchVersion
+
+    torch.serialization.add_safe_globals(
+        [
+            ListConfig,
+            ContainerMetadata,
+            Any,
+            list,
+            defaultdict,
+            dict,
+            int,
+            AnyNode,
+            Metadata,
+            TorchVersion,
+            Introspection,
+            Specifications,
+            Problem,
+            Resolution,
+        ]
+    )
+
+
+def modelo_por_defecto(torch: Any, device: str) -> str:
+    """
+    Modelo por defecto: `large-v3-turbo` en GPUs de 8 GB o más (4 capas
+    de decoder, más rápido que `medium` y más preciso en español) y
+    `medium` en CPU o GPUs chicas.
+    """
+    if device == "cuda" and torch.cuda.mem_get_info()[1] >= 8 << 30:
+        return "large-v3-turbo"
+    return "medium"
+
+
+def batch_automatico(torch: Any, model_name: str) -> int:
+    """
+    Elige el batch de CUDA según la VRAM libre (ya con el modelo
+    cargado): el mayor de BATCHES_CUDA que entra dejando 1 GiB de
+    margen, o 1 si no entra ninguno.
+    """
+    libre, _ = torch.cuda.mem_get_info()
+    por_elemento = _MIB_POR_ELEMENTO.get(model_name, 100) << 20
+    entran = (libre - (1 << 30)) // por_elemento
+    return max((b for b in BATCHES_CUDA if b <= entran), default=1)
+
+
+def cargar_modelo(
+    whisperx: Any,
+    model_name: str,
+    device: str,
+    compute_type: str,
+    backend: str = "whisperx",
+) -> Any:
+    """
+    Obtiene el modelo Whisper, cargándolo solo la primera vez. Se carga
+    sin idioma fijo: WhisperX detecta o usa el de cada `transcribe`.
+    """
+    clave = (backend, model_name, device, compute_type)
+    model = _MODELOS.get(clave)
+    if model is None:
+        # No tener dos modelos grandes a la vez en memoria/VRAM
+        _MODELOS.clear()
+        print(
+            f"[WhisperX] Cargando modelo {model_name} ({backend})...",
+            file=sys.stderr,
+        )
+        if backend == "faster":
+            from faster_whisper import (
+                BatchedInferencePipeline,
+                WhisperModel,
+            )
+
+            model = BatchedInferencePipeline(
+                model=WhisperModel(
+                    model_name,
+                    device=device,
+                    compute_type=compute_type,
+                    cpu_threads=CPU_THREADS,
+                    download_root=MODEL_DIR,
+                )
+            )
+        else:
+            registrar_globales_seguras()
+            model = whisperx.load_model(
+                model_name,
+                device,
+                compute_type=compute_type,
+                download_root=MODEL_DIR,
+                threads=CPU_THREADS,
+            )
+        _MODELOS[clave] = model
+        print(
+            f"[WhisperX] Modelo cargado correctamente (optimizado para español)",
+            file=sys.stderr,
+        )
+    return model
+
+
+def cargar_alineador(
+    whisperx: Any, language: str, device: str
+) -> tuple:
+    """
+    Obtiene el modelo de alineación y sus metadatos para un idioma,
+    cargándolos solo la primera vez.
+    """
+    clave = (language, device)
+    alineador = _ALINEADORES.get(clave)
+    if alineador is None:
+        print(
+            f"[WhisperX] Cargando alineación ({language})...",
+            file=sys.stderr,
+        )
+        alineador = whisperx.load_align_model(
+            language_code=language,
+            device=device,
+        )
+        _ALINEADORES[clave] = alineador
+    return alineador
+
+
+def alinear(
+    whisperx: Any,
+    torch: Any,
+    segments: list[dict],
+    audio: Any,
+    language: str,
+    device: str,
+) -> list[dict]:
+    """
+    Alinea los segmentos con wav2vec2 y devuelve las palabras con sus
+    tiempos.
+    """
+    print(f"[WhisperX] Alineando timestamps...", file=sys.stderr)
+    align_model, metadata = cargar_alineador(whisperx, language, device)
+    # En CUDA el wav2vec2 corre en fp16 con autocast (log_softmax
+    # se mantiene en fp32); sin autograd en ningún caso
+    with torch.inference_mode(), torch.autocast(
+        device_type="cuda",
+        dtype=torch.float16,
+        enabled=device == "cuda",
+    ):
+        aligned = whisperx.align(
+            segments,
+            align_model,
+            metadata,
+            audio,
+            device,
+            return_char_alignments=False,
+        )
+    print(f"[WhisperX] Alineamiento completado", file=sys.stderr)
+    return aligned.get("word_segments") or []
+
+
+def transcribir_faster(
+    pipeline: Any,
+    audio: Any,
+    language: str | None,
+    batch_size: int,
+    word_timestamps: bool = False,
+) -> dict:
+    """
+    Transcribe con faster-whisper y adapta el resultado al formato de
+    `transcribe` de WhisperX (`{"segments": [...], "language": ...}`)
+    que espera la alineación.
+
+    Con `word_timestamps` agrega `word_segments` con los tiempos por
+    palabra del propio Whisper, en el formato que produce la
+    alineación.
+    """
+    segmentos, info = pipeline.transcribe(
+        audio,
+        batch_size=batch_size,
+        language=language,
+        vad_filter=True,
+        word_timestamps=word_timestamps,
+    )
+    segments = []
+    word_segments = []
+    for s in segmentos:
+        segments.append(
+            {"start": s.start, "end": s.end, "text": s.text}
+        )
+        for w in s.words or ():
+            word_segments.append(
+                {"word": w.word, "start": w.start, "end": w.end}
+            )
+    return {
+        "segments": segments,
+        "word_segments": word_segments,
+        "language": info.language,
+    }
+
+
+def bloques_srt(word_segments: list[dict]) -> Iterator[str]:
+    """
+    Genera los bloques SRT (uno por palabra) a medida que se escriben,
+    sin armar la lista completa en memoria. Las palabras sin tiempos o
+    sin texto se omiten conservando la numeración original.
+
+    Los tiempos HH:MM:SS,mmm se calculan en línea con aritmética
+    entera (mismo redondeo que `segundos_a_tiempo_srt`), sin dos
+    llamadas por palabra.
+    """
+    for i, w in enumerate(word_segments, 1):
+        start, end = w.get("start"), w.get("end")
+        text = (w.get("word") or "").strip()
+        if start is None or end is None or not text:
+            continue
+        h1, ms1 = divmod(int(round(start * 1000)), 3600000)
+        m1, ms1 = divmod(ms1, 60000)
+        s1, ms1 = divmod(ms1, 1000)
+        h2, ms2 = divmod(int(round(end * 1000)), 3600000)
+        m2, ms2 = divmod(ms2, 60000)
+        s2, ms2 = divmod(ms2, 1000)
+        yield (
+            f"{i}\n{h1:02d}:{m1:02d}:{s1:02d},{ms1:03d} --> "
+            f"{h2:02d}:{m2:02d}:{s2:02d},{ms2:03d}\n{text}\n\n"
+        )
+
+
+def transcribir(
+    audio_path: str,
+    srt_path: str,
+    language: str | None = None,
+    device: str | None = None,
+    model: str | None = None,
+    batch_size: int | None = None,
+) -> dict:
+    """
+    Transcribe un audio y escribe el SRT palabra a palabra.
+
+    Returns:
+        dict: Resumen (device, modelo, batch, idioma y palabras).
+    """
+    LANGUAGE = language
+
+    # Asegurar que la raíz del proyecto esté en sys.path para poder importar `app.*`
+    project_root = Path(__file__).resolve().parents[1]
+    if str(project_root) not in sys.path:
+        sys.path.insert(0, str(project_root))
+
+    print(f"[WhisperX] Project root: {project_root}", file=sys.stderr)
+    print(f"[WhisperX] Audio: {audio_path}", file=sys.stderr)
+    print(f"[WhisperX] Output SRT: {srt_path}", file=sys.stderr)
+
+    # Segmentos expandibles en el allocator CUDA de torch: menos
+    # fragmentación con los tamaños variables de la alineación. Se
+    # lee al crear el allocator; no soportado en Windows
+    if os.name != "nt":
+        os.environ.setdefault(
+            "PYTORCH_CUDA_ALLOC_CONF", "expandable_segments:True"
+        )
+
+    import torch
+
+    print(
+        f"[WhisperX] PyTorch disponible, CUDA: {torch.cuda.is_available()}",
+        file=sys.stderr,
+    )
+
+    import whisperx
+
+    print(
+        f"[WhisperX] WhisperX importado correctamente",
+        file=sys.stderr,
+    )
+
+    # 1) Device: CLI > ENV > autodetect
+    device = (
+        device
+        or env("WHISPERX_DEVICE")
+        or ("cuda" if torch.cuda.is_available() else "cpu")
+    )
+    print(f"[WhisperX] Device seleccionado: {device}", file=sys.stderr)
+    if device == "cuda":
+        configurar_cuda(torch)
+    else:
+        configurar_cpu()
+
+    # 2) Modelo: CLI > ENV > default según el device (ver
+    # modelo_por_defecto)
+    model_name = (
+        model
+        or env("WHISPERX_MODEL")
+        or modelo_por_defecto(torch, device)
+    )
+    print(f"[WhisperX] Modelo: {model_name}", file=sys.stderr)
+
+    # 3) Compute type por device (se puede forzar por ENV). Ambos
+    # backends corren en CTranslate2: pesos INT8 (cómputo FP16 en GPU)
+    compute_type = env("WHISPERX_COMPUTE_TYPE")
+    if not compute_type:
+        compute_type = "int8_float16" if device == "cuda" else "int8"
+    print(f"[WhisperX] Compute type: {compute_type}", file=sys.stderr)
+
+    # 4) Batch-size: CLI > ENV > default (4 en CPU; en CUDA se elige
+    # según la VRAM libre una vez cargado el modelo)
+    if batch_size is None:
+        batch_size = as_int("WHISPERX_BATCH", 0) or None
+
+    # 5) Idioma
+    print(
+        f"[WhisperX] Idioma seleccionado: {LANGUAGE if LANGUAGE else 'AUTO (detectar)'}",
+        file=sys.stderr,
+    )
+
+    # 6) Backend ASR: ENV > default (pipeline de WhisperX)
+    backend = env("WHISPERX_BACKEND", "whisperx").lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"WHISPERX_BACKEND no soportado: {backend}")
+    print(f"[WhisperX] Backend: {backend}", file=sys.stderr)
+
+    # 7) Timestamps por palabra: `align` (wav2vec2, por defecto) o
+    # `whisper` (los de faster-whisper, solo con el backend `faster`)
+    word_ts = env("WHISPERX_WORD_TS", "align").lower()
+    if word_ts == "whisper" and backend != "faster":
+        print(
+            "[WhisperX] WHISPERX_WORD_TS=whisper requiere "
+            "WHISPERX_BACKEND=faster; se usa la alineación",
+            file=sys.stderr,
+        )
+
+    # 8) Limitar threads BLAS (opcional)
+    omp = as_int("OMP_NUM_THREADS", 0)
+    mkl = as_int("MKL_NUM_THREADS", 0)
+    if omp:
+        os.environ["OMP_NUM_THREADS"] = str(omp)
+    if mkl:
+        os.environ["MKL_NUM_THREADS"] = str(mkl)
+
+    asr_model = cargar_modelo(
+        whisperx, model_name, device, compute_type, backend
+    )
+    if batch_size is None:
+        batch_size = (
+            batch_automatico(torch, model_name)
+            if device == "cuda"
+            else 4
+        )
+    print(f"[WhisperX] Batch size: {batch_size}", file=sys.stderr)
+
+    print(f"[WhisperX] Cargando audio...", file=sys.stderr)
+    audio = whisperx.load_audio(audio_path)
+    print(
+        f"[WhisperX] Audio cargado (duración: {len(audio) / 16000:.2f}s)",
+        file=sys.stderr,
+    )
+
+    print(f"[WhisperX] Transcribiendo...", file=sys.stderr)
+    # El VAD de pyannote corre en torch: sin autograd (la alineación
+    # tiene su propio inference_mode)
+    with torch.inference_mode():
+        if backend == "faster":
+            result = transcribir_faster(
+                asr_model,
+                audio,
+                LANGUAGE,
+                batch_size,
+                word_timestamps=word_ts == "whisper",
+            )
+        else:
+            result = asr_model.transcribe(
+                audio, batch_size=batch_size, language=LANGUAGE
+            )
+    print(f"[WhisperX] Transcripción completada", file=sys.stderr)
+
+    # Obtener el idioma para alineación
+    # Si LANGUAGE es None (auto), usar el idioma detectado por Whisper
+    align_language = LANGUAGE if LANGUAGE else result.get("language")
+
+    print(
+        f"[WhisperX] Idioma detectado/usado: {align_language}",
+        file=sys.stderr,
+    )
+
+    word_segments = result.get("word_segments")
+    if word_segments:
+        print(
+            "[WhisperX] Timestamps por palabra de Whisper "
+            "(sin alineación)",
+            file=sys.stderr,
+        )
+    else:
+        word_segments = alinear(
+            whisperx,
+            torch,
+            result["segments"],
+            audio,
+            align_language,
+            device,
+        )
+    print(
+        f"[WhisperX] Palabras extraídas: {len(word_segments)}",
+        file=sys.stderr,
+    )
+
+    if not word_segments:
+        print(
+            f"WARNING: No se extrajeron palabras del audio",
+            file=sys.stderr,
+        )
+
+    os.makedirs(os.path.dirname(srt_path), exist_ok=True)
+    # Binario con búfer de 1 MiB: cada bloque se codifica al
+    # generarse, sin la capa de TextIOWrapper (saltos "\n" en todas
+    # las plataformas)
+    with open(srt_path, "wb", buffering=1024 * 1024) as f:
+        f.writelines(
+            bloque.encode("utf-8")
+            for bloque in bloques_srt(word_segments)
+        )
+
+    print(f"✓ SRT creado exitosamente: {srt_path}", file=sys.stderr)
+    return {
+        "device": device,
+        "model": model_name,
+        "batch": batch_size,
+        "compute_type": compute_type,
+        "backend": backend,
+        "language": LANGUAGE,
+        "palabras": len(word_segments),
+    }
+
+
+def servir() -> None:
+    """
+    Modo servidor: atiende trabajos JSON por stdin, uno por línea.
+
+    Cada línea `{"audio", "srt", "language"}` produce una única línea
+    JSON de respuesta en stdout (`{"ok": true, ...}` o
+    `{"ok": false, "error": ...}`). Los diagnósticos van a stderr.
+    """
+    # Reservar el stdout real para las respuestas y redirigir el fd 1 a
+    # stderr, para que ninguna librería mezcle texto con el protocolo
+    salida = os.fdopen(os.dup(1), "w", encoding="utf-8", buffering=1)
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+
+    for linea in sys.stdin:
+        if not linea.strip():
+            continue
+        try:
+            trabajo = json.loads(linea)
+            language = trabajo.get("language") or "auto"
+            resumen = transcribir(
+                trabajo["audio"],
+                trabajo["srt"],
+                None if language == "auto" else language,
+            )
+            respuesta = {"ok": True, **resumen}
+        except Exception as e:
+            traceback.print_exc(file=sys.stderr)
+            respuesta = {
+                "ok": False,
+                "error": f"{type(e).__name__}: {e}",
+            }
+        salida.write(json.dumps(respuesta) + "\n")
+
+
 def main() -> None:
     """
     Función principal que ejecuta la transcripción de audio a SRT.
@@ -68,7 +582,6 @@ def main() -> None:
     )
     parser.add_argument(
         "--audio",
-        required=True,
         help="Ruta del archivo de audio a transcribir (DEBE SER ESPAÑOL)",
     )
     parser.add_argument(
@@ -79,7 +592,6 @@ def main() -> None:
     )
     parser.add_argument(
         "--srt",
-        required=True,
         help="Ruta de salida para el archivo SRT",
     )
     parser.add_argument(
@@ -90,7 +602,7 @@ def main() -> None:
     parser.add_argument(
         "--model",
         default=None,
-        help="Modelo Whisper a usar (tiny, base, small, medium, large-v2)",
+        help="Modelo Whisper a usar (tiny, base, small, medium, large-v2, large-v3-turbo)",
     )
     parser.add_argument(
         "--batch_size",
@@ -98,8 +610,19 @@ def main() -> None:
         default=None,
         help="Tamaño del batch para transcripción",
     )
+    parser.add_argument(
+        "--servidor",
+        action="store_true",
+        help="Atender trabajos JSON por stdin con el modelo cargado",
+    )
     args = parser.parse_args()
 
+    if args.servidor:
+        servir()
+        return
+    if not args.audio or not args.srt:
+        parser.error("--audio y --srt son obligatorios")
+
     audio_path = args.audio
     srt_path = args.srt
 
@@ -108,178 +631,33 @@ def main() -> None:
     if LANGUAGE == "auto":
         LANGUAGE = None  # WhisperX usa None para autodetección
 
-    # Validaciones iniciales
-    if not os.path.exists(audio_path):
+    # Validaciones iniciales (un solo stat)
+    audio = Path(audio_path)
+    try:
+        audio.stat()
+    except OSError:
         print(
             f"ERROR: No existe el audio: {audio_path}", file=sys.stderr
         )
         sys.exit(2)
 
-    if not audio_path.lower().endswith(
-        (".wav", ".mp3", ".m4a", ".flac", ".ogg")
-    ):
+    if audio.suffix.lower() not in EXTENSIONES_AUDIO:
         print(
             f"WARNING: Archivo de audio podría no ser válido: {audio_path}",
             file=sys.stderr,
         )
 
     try:
-        # Asegurar que la raíz del proyecto esté en sys.path para poder importar `app.*`
-        project_root = Path(__file__).resolve().parents[1]
-        if str(project_root) not in sys.path:
-            sys.path.insert(0, str(project_root))
-
-        print(
-            f"[WhisperX] Project root: {project_root}", file=sys.stderr
-        )
-        print(f"[WhisperX] Audio: {audio_path}", file=sys.stderr)
-        print(f"[WhisperX] Output SRT: {srt_path}", file=sys.stderr)
-
-        import torch
-
-        print(
-            f"[WhisperX] PyTorch disponible, CUDA: {torch.cuda.is_available()}",
-            file=sys.stderr,
-        )
-
-        import whisperx
-
-        print(
-            f"[WhisperX] WhisperX importado correctamente",
-            file=sys.stderr,
-        )
-
-        from app.subtitles import segundos_a_tiempo_srt
-
-        # 1) Device: CLI > ENV > autodetect
-        device = (
-            args.device
-            or env("WHISPERX_DEVICE")
-            or ("cuda" if torch.cuda.is_available() else "cpu")
-        )
-        print(
-            f"[WhisperX] Device seleccionado: {device}", file=sys.stderr
-        )
-
-        # 2) Modelo: CLI > ENV > default (optimizado para español: medium)
-        # Para transcripción en español, 'medium' ofrece buen balance velocidad/precisión
-        # 'base' es más rápido, 'large-v2' es más preciso pero mucho más lento
-        model_name = args.model or env("WHISPERX_MODEL") or "medium"
-        print(f"[WhisperX] Modelo: {model_name}", file=sys.stderr)
-
-        # 3) Compute type por device (se puede forzar por ENV)
-        compute_type = env("WHISPERX_COMPUTE_TYPE")
-        if not compute_type:
-            compute_type = "float16" if device == "cuda" else "float32"
-        print(
-            f"[WhisperX] Compute type: {compute_type}", file=sys.stderr
-        )
-
-        # 4) Batch-size: CLI > ENV > default (optimizado para español)
-        # Para español con modelo medium, usar batch más pequeño en CPU
-        default_batch = 4 if device == "cpu" else 16
-        batch_size = (
-            args.batch_size
-            if args.batch_size is not None
-            else as_int("WHISPERX_BATCH", default_batch)
-        )
-        print(f"[WhisperX] Batch size: {batch_size}", file=sys.stderr)
-
-        # 5) Idioma
-        print(
-            f"[WhisperX] Idioma seleccionado: {LANGUAGE if LANGUAGE else 'AUTO (detectar)'}",
-            file=sys.stderr,
-        )
-
-        # 6) Limitar threads BLAS (opcional)
-        omp = as_int("OMP_NUM_THREADS", 0)
-        mkl = as_int("MKL_NUM_THREADS", 0)
-        if omp:
-            os.environ["OMP_NUM_THREADS"] = str(omp)
-        if mkl:
-            os.environ["MKL_NUM_THREADS"] = str(mkl)
-
-        print(
-            f"[WhisperX] Cargando modelo {model_name}...",
-            file=sys.stderr,
-        )
-        model = whisperx.load_model(
-            model_name,
-            device,
-            compute_type=compute_type,
-            language=LANGUAGE,
-        )
-        print(
-            f"[WhisperX] Modelo cargado correctamente (optimizado para español)",
-            file=sys.stderr,
-        )
-
-        print(f"[WhisperX] Cargando audio...", file=sys.stderr)
-        audio = whisperx.load_audio(audio_path)
-        print(
-            f"[WhisperX] Audio cargado (duración: {len(audio) / 16000:.2f}s)",
-            file=sys.stderr,
-        )
-
-        print(f"[WhisperX] Transcribiendo...", file=sys.stderr)
-        result = model.transcribe(audio, batch_size=batch_size)
-        print(f"[WhisperX] Transcripción completada", file=sys.stderr)
-
-        # Obtener el idioma para alineación
-        # Si LANGUAGE es None (auto), usar el idioma detectado por Whisper
-        align_language = (
-            LANGUAGE if LANGUAGE else result.get("language")
+        resumen = transcribir(
+            audio_path,
+            srt_path,
+            LANGUAGE,
+            device=args.device,
+            model=args.model,
+            batch_size=args.batch_size,
         )
-
         print(
-            f"[WhisperX] Idioma detectado/usado: {align_language}",
-            file=sys.stderr,
-        )
-
-        print(f"[WhisperX] Alineando timestamps...", file=sys.stderr)
-        align_model, metadata = whisperx.load_align_model(
-            language_code=align_language,
-            device=device,
-        )
-        aligned = whisperx.align(
-            result["segments"],
-            align_model,
-            metadata,
-            audio,
-            device,
-            return_char_alignments=False,
-        )
-        print(f"[WhisperX] Alineamiento completado", file=sys.stderr)
-
-        word_segments = aligned.get("word_segments") or []
-        print(
-            f"[WhisperX] Palabras extraídas: {len(word_segments)}",
-            file=sys.stderr,
-        )
-
-        if not word_segments:
-            print(
-                f"WARNING: No se extrajeron palabras del audio",
-                file=sys.stderr,
-            )
-
-        lines = []
-        for i, w in enumerate(word_segments, 1):
-            start, end = w.get("start"), w.get("end")
-            text = (w.get("word") or "").strip()
-            if start is None or end is None or not text:
-                continue
-            lines.append(
-                f"{i}\n{segundos_a_tiempo_srt(start)} --> {segundos_a_tiempo_srt(end)}\n{text}\n\n"
-            )
-
-        os.makedirs(os.path.dirname(srt_path), exist_ok=True)
-        with open(srt_path, "w", encoding="utf-8") as f:
-            f.write("".join(lines))
-
-        print(f"✓ SRT creado exitosamente: {srt_path}", file=sys.stderr)
-        print(
-            f"[WhisperX] device={device} model={model_name} batch={batch_size} compute_type={compute_type} language={LANGUAGE} palabras={len(word_segments)}"
+            f"[WhisperX] device={resumen['device']} model={resumen['model']} batch={resumen['batch']} compute_type={resumen['compute_type']} language={LANGUAGE} palabras={resumen['palabras']}"
         )
 
     except ImportError as e:
@@ -293,8 +671,6 @@ def main() -> None:
         sys.exit(2)
     except Exception as e:
         print(f"ERROR: {type(e).__name__}: {e}", file=sys.stderr)
-        import traceback
-
         traceback.print_exc(file=sys.stderr)
         sys.exit(1)
 
@@ -0,0 +1,116 @@
+"""
+Módulo del proceso WhisperX persistente.
+Mantiene `whisperx_run.py --servidor` vivo en `venv_torch` para pagar el
+arranque de Python, la importación de torch y la carga del modelo una
+sola vez en lugar de una vez por video.
+"""
+
+import asyncio
+import os
+import subprocess
+
+from app.procesos import PROJECT_ROOT, ProcesoPersistente
+
+SCRIPT_PATH = os.path.join(PROJECT_ROOT, "app", "whisperx_run.py")
+VENV_TORCH_PYTHON = os.getenv(
+    "WHISPERX_PY",
+    os.path.join(PROJECT_ROOT, "venv_torch", "Scripts", "python.exe"),
+)
+# Desactivar para volver a lanzar un proceso nuevo por cada video
+WHISPERX_WORKER = os.getenv("WHISPERX_WORKER", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+
+class TranscriptorWhisperX:
+    """
+    Transcribe con el proceso WhisperX persistente o, si no está
+    disponible, con un proceso nuevo por video. En ambos casos se
+    atiende una transcripción a la vez (una GPU).
+    """
+
+    def __init__(self) -> None:
+        self._worker = ProcesoPersistente(
+            "WhisperX", VENV_TORCH_PYTHON, SCRIPT_PATH
+        )
+        self._lock = asyncio.Lock()
+        self._activo = WHISPERX_WORKER
+
+    async def iniciar(self) -> None:
+        """
+        Lanza el proceso por adelantado. Si no se puede (venv ausente o
+        event loop sin subprocesos) se usa el modo de un proceso por
+        video.
+        """
+        if self._activo:
+            self._activo = await self._worker.iniciar()
+
+    async def transcribir(
+        self, audio: str, srt: str, language: str = "auto"
+    ) -> dict:
+        """
+        Transcribe `audio` y escribe el SRT en `srt`.
+
+        Returns:
+            dict: Resumen devuelto por whisperx_run.py.
+
+        Raises:
+            subprocess.CalledProcessError: Si la transcripción falla.
+        """
+        if self._activo:
+            return await self._worker.ejecutar(
+                {"audio": audio, "srt": srt, "language": language}
+            )
+        # También sin worker: un solo WhisperX a la vez (una GPU)
+        async with self._lock:
+            return await transcribir_en_proceso_nuevo(
+                audio, srt, language
+            )
+
+    async def detener(self) -> None:
+        """Cierra el proceso WhisperX persistente."""
+        await self._worker.detener()
+
+
+async def transcribir_en_proceso_nuevo(
+    audio: str, srt: str, language: str = "auto"
+) -> dict:
+    """
+    Ejecuta whisperx_run.py en un proceso propio (modo sin worker).
+
+    Raises:
+        subprocess.CalledProcessError: Si el script termina con error.
+    """
+    resultado = await asyncio.to_thread(
+        subprocess.run,
+        [
+            VENV_TORCH_PYTHON,
+            SCRIPT_PATH,
+            "--audio",
+            audio,
+            "--srt",
+            srt,
+            "--language",
+            language,
+        ],
+        check=False,  # No lanzar excepción, capturar el código
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if resultado.returncode != 0:
+        print(f"ERROR WhisperX - Código: {resultado.returncode}")
+        print(f"STDOUT:\n{resultado.stdout}")
+        print(f"STDERR:\n{resultado.stderr}")
+        raise subprocess.CalledProcessError(
+            resultado.returncode,
+            "whisperx_run.py",
+            output=resultado.stdout,
+            stderr=resultado.stderr,
+        )
+    return {"ok": True, "salida": resultado.stdout.strip()}
+
+
+transcriptor_whisperx = TranscriptorWhisperX()